@@ -0,0 +1,370 @@
+#
+#
+# TEAM BALANCER FOR elo_project
+
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from elo_rating import win_probability_batch
+
+# best_splits searches in this process first and only hands the search to a process
+# pool if it visits this many nodes without finishing. That's about 0.7 s of search,
+# roughly what starting the workers costs; pools of realistic size (30-60 players)
+# finish in a few ms, where going parallel was 5-10x slower even with warm workers.
+SERIAL_NODE_BUDGET = 500_000
+TASKS_PER_WORKER = 4  # Fixed prefixes per worker, so a slow subtree doesn't leave the others idle
+
+
+def balance_teams(player_elo):
+    """
+    Split players into two teams with the smallest possible total ELO difference.
+
+    Uses an exact subset-sum DP over team size, with each reachable team total
+    stored as a bit in a Python int, instead of enumerating every combination.
+
+    Args:
+        player_elo (list): (name, elo) tuples, in the order teams should be listed.
+
+    Returns:
+        tuple: Two lists of (name, elo) tuples. Team 1 gets len(player_elo) // 2 players.
+    """
+    num_players = len(player_elo)
+    half_size = num_players // 2
+    if half_size == 0:
+        return [], list(player_elo)
+
+    # Shift every ELO so the smallest is 0; bit positions can't be negative
+    elos = [int(round(elo)) for _, elo in player_elo]
+    offset = min(elos)
+    weights = [elo - offset for elo in elos]
+
+    # reachable[c] has bit s set if some c players have a shifted total of s.
+    # history[i] is the table before player i was considered, for rebuilding the team.
+    reachable = [1] + [0] * half_size
+    history = []
+    for i, weight in enumerate(weights):
+        history.append(reachable[:])
+        for count in range(min(i, half_size - 1), -1, -1):
+            if reachable[count]:
+                reachable[count + 1] |= reachable[count] << weight
+
+    # Team 1 (shifted total s) vs Team 2: diff = 2s - total + (2 * half - n) * offset
+    total = sum(weights)
+    bias = (2 * half_size - num_players) * offset - total
+    candidates = reachable[half_size]
+    ideal = max(0, -bias // 2)
+    best_sum = None
+    for distance in range(max(ideal, candidates.bit_length() - ideal) + 1):
+        for s in (ideal - distance, ideal + distance, ideal + distance + 1):
+            if s >= 0 and (candidates >> s) & 1:
+                if best_sum is None or abs(2 * s + bias) < abs(2 * best_sum + bias):
+                    best_sum = s
+        if best_sum is not None:
+            break
+
+    # Walk back through the players to recover who makes up that total
+    in_team1 = [False] * num_players
+    count, s = half_size, best_sum
+    for i in range(num_players - 1, -1, -1):
+        if count == 0:
+            break
+        if not (history[i][count] >> s) & 1:
+            in_team1[i] = True
+            s -= weights[i]
+            count -= 1
+
+    team1 = [player for i, player in enumerate(player_elo) if in_team1[i]]
+    team2 = [player for i, player in enumerate(player_elo) if not in_team1[i]]
+    return team1, team2
+
+
+# win_prob is Team 1's chance of winning, from the teams' average ELO
+Split = namedtuple("Split", ["team1", "team2", "diff", "win_prob"])
+
+
+def _order_players(player_elo):
+    """Highest ELO first (ties by name) so the search fixes the big contributions early."""
+    return sorted(player_elo, key=lambda player: (-player[1], player[0]))
+
+
+def _compile_constraints(names, apart, together, spread, avoid):
+    """Turn name-based constraints into index-based checks for the search."""
+    index = {name: i for i, name in enumerate(names)}
+
+    def known(group):
+        return [index[name] for name in group if name in index]
+
+    # partners[i]: (j, same_side) for earlier players j that i is tied to
+    partners = [[] for _ in names]
+    for pairs, same_side in ((together, True), (apart, False)):
+        for pair in pairs:
+            members = known(pair)
+            for a in members:
+                for b in members:
+                    if a < b:
+                        partners[b].append((a, same_side))
+
+    # spread: each group may put at most ceil(len / 2) members on one side
+    spread_groups = [known(group) for group in spread]
+    spread_groups = [group for group in spread_groups if len(group) > 1]
+    spread_of = [[] for _ in names]
+    for g, group in enumerate(spread_groups):
+        for i in group:
+            spread_of[i].append(g)
+    spread_caps = [(len(group) + 1) // 2 for group in spread_groups]
+
+    avoided = {
+        frozenset((frozenset(team1), frozenset(team2))) for team1, team2 in avoid
+    }
+    return partners, spread_of, spread_caps, avoided
+
+
+class _BudgetExceeded(Exception):
+    """Raised by _search when it has visited max_nodes nodes without finishing."""
+
+
+def _search(names, elos, half_size, k, constraints, prefix=(), shared_bound=None, max_nodes=None):
+    """
+    Depth-first branch and bound over team assignments.
+
+    Leaves are reached in increasing order of team 1's sorted index tuple, so once k
+    splits are kept, anything that can't beat the k-th difference outright is pruned
+    and the result is the k best splits by (diff, team 1 indices).
+
+    Args:
+        prefix (tuple): Sides (0 = team 1, 1 = team 2) already fixed for the first players.
+        shared_bound (multiprocessing.Value): The smallest k-th difference any worker has
+            found. Only subtrees that are strictly worse are pruned against it, since a
+            tie could still win on team 1 indices; each worker publishes its own k-th.
+        max_nodes (int): Give up with _BudgetExceeded after visiting this many nodes.
+
+    Returns:
+        list: Up to k (diff, team1_indices) tuples, best first.
+    """
+    partners, spread_of, spread_caps, avoided = constraints
+    num_players = len(names)
+    total = sum(elos)
+    team2_size = num_players - half_size
+    prefix_sums = [0]
+    for elo in elos:
+        prefix_sums.append(prefix_sums[-1] + elo)
+
+    best = []  # Sorted (diff, team1 indices), at most k long
+    side = [0] * num_players
+    spread_counts = [[0, 0] for _ in spread_caps]
+    nodes_left = [max_nodes]
+
+    def lower_bound(i, sum1, count1):
+        # Team 1 still needs `need` of the players i.. ; its final total lies between
+        # taking the `need` lowest and the `need` highest of them
+        need = half_size - count1
+        low = sum1 + prefix_sums[num_players] - prefix_sums[num_players - need]
+        high = sum1 + prefix_sums[i + need] - prefix_sums[i]
+        if 2 * high < total:
+            return total - 2 * high
+        if 2 * low > total:
+            return 2 * low - total
+        return total % 2 if isinstance(total, int) else 0
+
+    def assign(i, s, sum1, count1):
+        # Returns False if player i can't go on side s given the players before it
+        for j, same_side in partners[i]:
+            if (side[j] == s) != same_side:
+                return False
+        for g in spread_of[i]:
+            if spread_counts[g][s] >= spread_caps[g]:
+                return False
+        side[i] = s
+        for g in spread_of[i]:
+            spread_counts[g][s] += 1
+        return True
+
+    def unassign(i, s):
+        for g in spread_of[i]:
+            spread_counts[g][s] -= 1
+
+    def visit(i, sum1, count1):
+        if max_nodes is not None:
+            nodes_left[0] -= 1
+            if nodes_left[0] < 0:
+                raise _BudgetExceeded
+        if i == num_players:
+            team1 = tuple(j for j in range(num_players) if side[j] == 0)
+            if avoided:
+                team2 = frozenset(names[j] for j in range(num_players) if side[j] == 1)
+                if frozenset((frozenset(names[j] for j in team1), team2)) in avoided:
+                    return
+            diff = abs(2 * sum1 - total)
+            if len(best) == k and diff >= best[-1][0]:
+                return
+            if shared_bound is not None and diff > shared_bound.value:
+                return
+            best.append((diff, team1))
+            best.sort()
+            del best[k:]
+            if shared_bound is not None and len(best) == k:
+                with shared_bound.get_lock():
+                    if best[-1][0] < shared_bound.value:
+                        shared_bound.value = best[-1][0]
+            return
+
+        # Prune subtrees whose best possible difference can't make the list
+        if len(best) == k or shared_bound is not None:
+            bound = lower_bound(i, sum1, count1)
+            if len(best) == k and bound >= best[-1][0]:
+                return
+            if shared_bound is not None and bound > shared_bound.value:
+                return
+
+        # Team 1 first, so leaves come out in increasing key order
+        for s in (0, 1):
+            if s == 0 and count1 == half_size:
+                continue
+            if s == 1 and i - count1 == team2_size:
+                continue
+            if not assign(i, s, sum1, count1):
+                continue
+            if s == 0:
+                visit(i + 1, sum1 + elos[i], count1 + 1)
+            else:
+                visit(i + 1, sum1, count1)
+            unassign(i, s)
+
+    # Replay the fixed prefix, then search the rest
+    sum1 = count1 = 0
+    for i, s in enumerate(prefix):
+        if (s == 0 and count1 == half_size) or (s == 1 and i - count1 == team2_size):
+            return []
+        if not assign(i, s, sum1, count1):
+            return []
+        if s == 0:
+            sum1 += elos[i]
+            count1 += 1
+    visit(len(prefix), sum1, count1)
+    return best
+
+
+# Worker processes get the shared bound once, when they start
+_worker_bound = None
+
+
+def _init_worker(bound):
+    global _worker_bound
+    _worker_bound = bound
+
+
+def _search_task(names, elos, half_size, k, constraints, prefix):
+    return _search(names, elos, half_size, k, constraints, prefix, _worker_bound)
+
+
+# One pool for the life of the process, created on first use. Searches take turns
+# on it because they share one bound. Workers are spawned rather than forked, since
+# forking a threaded server like Streamlit can copy held locks into the children.
+_mp_context = multiprocessing.get_context("spawn")
+_pool = None
+_pool_bound = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _parallel_search(names, elos, half_size, k, constraints, prefix, workers):
+    """
+    Split the search by fixing the sides of the first few players, one prefix per task,
+    and merge the workers' k best. Every split is under exactly one prefix and only
+    splits that can't be in the overall k best are pruned, so the result is the same
+    as the serial search.
+    """
+    global _pool, _pool_bound, _pool_workers
+    depth = min(len(names) - 1, len(prefix) + math.ceil(math.log2(TASKS_PER_WORKER * workers)))
+    prefixes = [prefix + rest for rest in itertools.product((0, 1), repeat=depth - len(prefix))]
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool_bound = _mp_context.Value("d", math.inf)
+            _pool = ProcessPoolExecutor(
+                workers, mp_context=_mp_context, initializer=_init_worker, initargs=(_pool_bound,)
+            )
+            _pool_workers = workers
+        _pool_bound.value = math.inf
+        futures = [
+            _pool.submit(_search_task, names, elos, half_size, k, constraints, task_prefix)
+            for task_prefix in prefixes
+        ]
+        found = [split for future in futures for split in future.result()]
+    found.sort()
+    return found[:k]
+
+
+def best_splits(player_elo, k=5, apart=(), together=(), spread=(), avoid=(), workers=None):
+    """
+    Find the k most balanced splits that satisfy the constraints.
+
+    Args:
+        player_elo (list): (name, elo) tuples.
+        k (int): How many splits to return; 0 or less returns [], as do fewer than 2 players.
+        apart (list): Pairs of names that must be on opposite teams.
+        together (list): Pairs (or larger groups) of names that must be on the same team.
+        spread (list): Groups of names (e.g. setters) to split as evenly as possible.
+        avoid (list): (team1_names, team2_names) splits not to repeat, e.g. last game's teams.
+        workers (int): Processes to search with. By default the search runs in this
+            process and moves to one process per CPU only if it takes more than
+            SERIAL_NODE_BUDGET nodes. The result doesn't depend on it.
+
+    Returns:
+        list: Up to k Split(team1, team2, diff, win_prob) tuples, smallest ELO difference first.
+            Team 1 gets len(player_elo) // 2 players.
+    """
+    if k < 1 or len(player_elo) < 2:
+        return []  # No split has a player on each side; pruning also needs k >= 1
+    ordered = _order_players(player_elo)
+    names = [name for name, _ in ordered]
+    elos = [elo for _, elo in ordered]
+    half_size = len(ordered) // 2
+    constraints = _compile_constraints(names, apart, together, spread, avoid)
+
+    # With equal team sizes, swapping the teams gives the same split; keep the
+    # highest-rated player on team 1 to search each split once
+    prefix = (0,) if ordered and 2 * half_size == len(ordered) else ()
+    found = None
+    if workers is None:
+        workers = os.cpu_count() or 1
+        if workers > 1:
+            try:
+                found = _search(names, elos, half_size, k, constraints, prefix, max_nodes=SERIAL_NODE_BUDGET)
+            except _BudgetExceeded:
+                pass  # A big search; worth starting the workers for
+    if found is None:
+        if workers > 1 and len(ordered) > len(prefix) + 1:
+            found = _parallel_search(names, elos, half_size, k, constraints, prefix, workers)
+        else:
+            found = _search(names, elos, half_size, k, constraints, prefix)
+    return _to_splits(ordered, found)
+
+
+def _to_splits(ordered, found):
+    if not found:
+        return []
+    # Win probabilities for every split in one vectorized call
+    team = np.full((len(found), len(ordered)), 2)
+    for row, (_, team1) in enumerate(found):
+        team[row, list(team1)] = 1
+    win_probs = win_probability_batch([elo for _, elo in ordered], team)
+
+    splits = []
+    for (diff, team1), members, win_prob in zip(found, team, win_probs):
+        splits.append(Split(
+            [ordered[i][0] for i in team1],
+            [ordered[i][0] for i in range(len(ordered)) if members[i] != 1],
+            diff,
+            float(win_prob),
+        ))
+    return splits
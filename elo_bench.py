@@ -0,0 +1,338 @@
+#
+#
+# BENCHMARKS FOR elo_project
+#
+# Runs entirely offline: the Sheets backend is pointed at in-memory fake worksheets.
+#   python elo_bench.py                 full run
+#   python elo_bench.py --quick         fewer repeats and smaller inputs
+#   python elo_bench.py --latency-ms 150   simulate a network round trip per Sheets call
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# Keep the benchmark's matches out of the real match journal
+os.environ["ELO_JOURNAL_PATH"] = os.path.join(tempfile.mkdtemp(prefix="elo_bench_"), "journal.jsonl")
+
+import elo_project
+from elo_balancer import balance_teams, best_splits
+from elo_history import HISTORY_HEADERS
+from elo_rating import DEFAULT_ELO, calculate_elo_change, calculate_elo_change_batch, win_probability, win_probability_batch
+from elo_replay import replay_history
+from elo_storage import SheetsStorage, SQLiteStorage
+
+
+def _cell(a1):
+    """Convert an A1 cell like 'B12' to (row, col), both 1-based."""
+    letters, digits = re.match(r"([A-Z]+)(\d+)", a1).groups()
+    col = 0
+    for letter in letters:
+        col = col * 26 + ord(letter) - ord("A") + 1
+    return int(digits), col
+
+
+class FakeWorksheet:
+    """In-memory stand-in for the parts of gspread.Worksheet that elo_project uses."""
+
+    def __init__(self, title, rows, latency=0.0):
+        self.title = title
+        self.rows = [list(row) for row in rows]
+        self.latency = latency
+        self.calls = 0
+
+    def _request(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        while len(cells) < col:
+            cells.append("")
+        cells[col - 1] = value
+
+    def _write(self, range_name, values):
+        row, col = _cell(range_name.split(":")[0])
+        for i, values_row in enumerate(values):
+            for j, value in enumerate(values_row):
+                self._set(row + i, col + j, value)
+
+    def get_all_values(self):
+        self._request()
+        return [list(row) for row in self.rows]
+
+    def get_all_records(self, expected_headers=None):
+        self._request()
+        headers = self.rows[0]
+        return [dict(zip(headers, row + [""] * (len(headers) - len(row)))) for row in self.rows[1:]]
+
+    def col_values(self, col):
+        self._request()
+        return [row[col - 1] if len(row) >= col else "" for row in self.rows]
+
+    def update_cell(self, row, col, value):
+        self._request()
+        self._set(row, col, value)
+
+    def update(self, range_name=None, values=None):
+        self._request()
+        self._write(range_name, values)
+
+    def batch_update(self, data):
+        self._request()
+        for block in data:
+            self._write(block["range"], block["values"])
+
+    def append_row(self, row):
+        self._request()
+        self.rows.append(list(row))
+
+    def append_rows(self, rows):
+        self._request()
+        self.rows.extend(list(row) for row in rows)
+
+
+def fake_sheets(num_players, latency=0.0, seed=0):
+    """Build fake ELO_Data and Match History tabs and point elo_project at them."""
+    rng = random.Random(seed)
+    players = [
+        [f"Player{i}", rng.randint(800, 1300), rng.randint(0, 40), rng.randint(-4, 4)]
+        for i in range(num_players)
+    ]
+    tabs = {
+        elo_project.PLAYER_TAB_NAME: FakeWorksheet(
+            elo_project.PLAYER_TAB_NAME, [elo_project.PLAYER_HEADERS] + players, latency
+        ),
+        elo_project.MATCH_HISTORY_TAB_NAME: FakeWorksheet(
+            elo_project.MATCH_HISTORY_TAB_NAME, [["Date", "Team 1", "Team 2", "Score"]], latency
+        ),
+        elo_project.PLAYER_HISTORY_TAB_NAME: FakeWorksheet(
+            elo_project.PLAYER_HISTORY_TAB_NAME, [HISTORY_HEADERS], latency
+        ),
+    }
+    elo_project.sheets_storage = SheetsStorage(
+        tabs.__getitem__, elo_project.PLAYER_TAB_NAME, elo_project.MATCH_HISTORY_TAB_NAME,
+        elo_project.PLAYER_HISTORY_TAB_NAME,
+    )
+    elo_project.storage = elo_project.sheets_storage
+    elo_project.invalidate_player_cache()
+    return tabs
+
+
+def random_history(num_matches, num_players, team_size=6, seed=0):
+    """Random Match History rows spread over a year."""
+    rng = random.Random(seed)
+    names = [f"Player{i}" for i in range(num_players)]
+    rows = []
+    for _ in range(num_matches):
+        chosen = rng.sample(names, 2 * team_size)
+        loser_score = rng.randint(5, 19)
+        score = f"21-{loser_score}" if rng.random() < 0.5 else f"{loser_score}-21"
+        date = f"{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}-2025"
+        rows.append([date, ",".join(chosen[:team_size]), ",".join(chosen[team_size:]), score])
+    return rows
+
+
+def measure(fn, repeat):
+    """Run fn repeat times; return latencies in ms and peak traced memory in KiB for one run."""
+    latencies = []
+    # elo_project prints progress messages; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()  # Warm-up
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, peak
+
+
+def report(name, latencies, peak, extra=""):
+    latencies = sorted(latencies)
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0]
+    print(
+        f"{name:<40} p50 {p50:9.3f} ms  p95 {p95:9.3f} ms  p99 {p99:9.3f} ms"
+        f"  max {latencies[-1]:9.3f} ms  peak {peak:9.1f} KiB  {extra}"
+    )
+
+
+def bench_balancer(sizes, repeat):
+    print("\nTeam balancing (balance_teams)")
+    rng = random.Random(1)
+    for n in sizes:
+        players = [(f"Player{i}", rng.randint(800, 1300)) for i in range(n)]
+        players.sort(key=lambda p: p[1], reverse=True)
+        report(f"  {n} players", *measure(lambda: balance_teams(players), repeat))
+
+
+def bench_best_splits(sizes, repeat):
+    print("\nCandidate splits (best_splits, k=5)")
+    rng = random.Random(3)
+    parallel = max(2, os.cpu_count() or 1)
+    for n in sizes:
+        players = [(f"Player{i}", rng.randint(800, 1300)) for i in range(n)]
+        setters = [name for name, _ in players[:4]]
+        apart = [(players[4][0], players[5][0])]
+        report(f"  {n} players, default", *measure(lambda: best_splits(players), repeat))
+        report(f"  {n} players, spread + apart", *measure(
+            lambda: best_splits(players, spread=[setters], apart=apart), repeat
+        ))
+        report(f"  {n} players, {parallel} workers (warm)", *measure(
+            lambda: best_splits(players, workers=parallel), repeat
+        ))
+
+
+def bench_create_match(sizes, repeat):
+    print("\nTeam creation end to end (create_match_button, warm cache)")
+    for n in sizes:
+        fake_sheets(max(n, 40))
+        names = [f"Player{i}" for i in range(n)]
+        latencies, peak = measure(lambda: elo_project.create_match_button(names), repeat)
+        report(f"  {n} players", latencies, peak)
+
+
+def bench_elo_change(repeat, matches):
+    print("\nELO change throughput")
+    stats = {
+        f"P{i}": {"Player Name": f"P{i}", "elo": DEFAULT_ELO, "matches": i, "streak": i % 5 - 2}
+        for i in range(12)
+    }
+    team1, team2 = list(stats)[:6], list(stats)[6:]
+    elos = [DEFAULT_ELO] * 6
+
+    def scalar():
+        for _ in range(matches):
+            calculate_elo_change(elos, elos, 21, 15, stats, team1, team2)
+
+    latencies, peak = measure(scalar, repeat)
+    rate = matches / (statistics.median(latencies) / 1000)
+    report(f"  calculate_elo_change x{matches}", latencies, peak, f"{rate:,.0f} matches/s")
+
+    rng = random.Random(2)
+    played = np.array([[rng.randint(0, 30) for _ in range(12)] for _ in range(matches)])
+    streaks = np.array([[rng.randint(-4, 4) for _ in range(12)] for _ in range(matches)])
+    team = np.tile([1] * 6 + [2] * 6, (matches, 1))
+    score1 = np.full(matches, 21)
+    score2 = np.array([rng.randint(0, 19) for _ in range(matches)])
+    latencies, peak = measure(lambda: calculate_elo_change_batch(played, streaks, team, score1, score2), repeat)
+    rate = matches / (statistics.median(latencies) / 1000)
+    report(f"  calculate_elo_change_batch x{matches}", latencies, peak, f"{rate:,.0f} matches/s")
+
+    # Win probability for candidate splits of one 12-player session
+    ratings = np.array([rng.randint(800, 1400) for _ in range(12)])
+    splits = np.array([rng.sample(range(12), 12) for _ in range(matches)])
+    split_team = np.where(splits < 6, 1, 2)
+
+    def scalar_win():
+        for row in split_team:
+            win_probability(ratings[row == 1].tolist(), ratings[row == 2].tolist())
+
+    latencies, peak = measure(scalar_win, repeat)
+    rate = matches / (statistics.median(latencies) / 1000)
+    report(f"  win_probability x{matches}", latencies, peak, f"{rate:,.0f} splits/s")
+    latencies, peak = measure(lambda: win_probability_batch(ratings, split_team), repeat)
+    rate = matches / (statistics.median(latencies) / 1000)
+    report(f"  win_probability_batch x{matches}", latencies, peak, f"{rate:,.0f} splits/s")
+
+
+def bench_replay(sizes, repeat):
+    print("\nFull history replay (replay_history)")
+    for num_matches in sizes:
+        rows = random_history(num_matches, 80)
+        latencies, peak = measure(lambda: replay_history(rows), repeat)
+        report(f"  {num_matches} matches", latencies, peak)
+
+
+def bench_leaderboard(sizes, repeat):
+    import pandas as pd
+
+    print("\nLeaderboard rendering")
+    for n in sizes:
+        fake_sheets(n)
+        elo_project.get_player_stats()  # Warm the cache
+
+        def dataframe():
+            df = pd.DataFrame({name: dict(stats) for name, stats in elo_project.get_player_stats().items()}).T
+            return df.sort_values(by="elo", ascending=False)
+
+        report(f"  {n} players, get_leaderboard", *measure(elo_project.get_leaderboard, repeat))
+        report(f"  {n} players, DataFrame + sort", *measure(dataframe, repeat))
+
+
+def bench_storage(repeat, latency):
+    print(f"\nMatch commit round trips (simulated latency {latency * 1000:.0f} ms per Sheets call)")
+    tabs = fake_sheets(40, latency)
+    team1 = ",".join(f"Player{i}" for i in range(6))
+    team2 = ",".join(f"Player{i}" for i in range(6, 12))
+
+    def sheets_commit():
+        elo_project.invalidate_player_cache()  # Cold read, like the first match of the night
+        elo_project.log_match(team1, team2, "21-17")
+
+    def sheets_commit_synced():
+        sheets_commit()
+        elo_project.flush_journal()  # Until the background sync has reached the sheet
+
+    before = sum(tab.calls for tab in tabs.values())
+    latencies, peak = measure(sheets_commit_synced, repeat)
+    calls = (sum(tab.calls for tab in tabs.values()) - before) / (repeat + 2)
+    report("  log_match + sync, Sheets (fake)", latencies, peak, f"{calls:.1f} API calls/match")
+    if elo_project.journal is not None:
+        report("  log_match returns (journaled)", *measure(sheets_commit, repeat))
+        elo_project.flush_journal()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = elo_project.storage.load_players()
+        elo_project.storage = SQLiteStorage(f"{tmp}/bench.db")
+        elo_project.storage.save_players(rows)
+
+        def sqlite_commit():
+            elo_project.invalidate_player_cache()
+            elo_project.log_match(team1, team2, "21-17")
+            elo_project.flush_journal()
+
+        report("  log_match, SQLite", *measure(sqlite_commit, repeat))
+        elo_project.storage.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the volleyball ELO tracker.")
+    parser.add_argument("--quick", action="store_true", help="fewer repeats and smaller inputs")
+    parser.add_argument("--repeat", type=int, help="timed runs per case")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency per Sheets call")
+    args = parser.parse_args()
+
+    repeat = args.repeat or (5 if args.quick else 30)
+    latency = args.latency_ms / 1000
+    balance_sizes = [8, 12, 16, 20, 24, 30] if not args.quick else [8, 16, 30]
+
+    bench_balancer(balance_sizes, repeat)
+    bench_best_splits([12, 30, 60] if args.quick else [12, 24, 30, 40, 60, 100], repeat)
+    bench_create_match(balance_sizes, repeat)
+    bench_elo_change(repeat, 1000 if args.quick else 10000)
+    bench_replay([1000, 10000] if args.quick else [1000, 10000, 50000], max(1, repeat // 5))
+    bench_leaderboard([50, 500] if args.quick else [50, 500, 5000], repeat)
+    bench_storage(max(1, repeat // 5), latency)
+
+
+if __name__ == "__main__":
+    main()
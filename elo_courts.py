@@ -0,0 +1,142 @@
+#
+#
+# MULTI-COURT SCHEDULER FOR elo_project
+#
+# Splits a big group into N courts x 2 teams so the worst court is as even as
+# possible, and rotates who sits out when there are more players than spots.
+
+import random
+import time
+from collections import namedtuple
+
+from elo_balancer import balance_teams
+
+MAX_TEAM_SIZE = 6
+TIME_LIMIT = 1.0  # Seconds of local search per round
+
+Court = namedtuple("Court", ["team1", "team2", "diff"])
+
+
+def choose_sit_outs(names, spots, sit_out_counts, rng):
+    """Pick who sits out: the players who have sat out least so far sit out next, ties broken at random."""
+    extra = len(names) - spots
+    if extra <= 0:
+        return []
+    shuffled = list(names)
+    rng.shuffle(shuffled)
+    shuffled.sort(key=lambda name: sit_out_counts.get(name, 0))
+    return shuffled[:extra]
+
+
+def _court_gap(group, elo_of, cache):
+    """Smallest possible ELO difference between the two teams on one court."""
+    key = frozenset(group)
+    gap = cache.get(key)
+    if gap is None:
+        team1, team2 = balance_teams([(name, elo_of[name]) for name in group])
+        gap = cache[key] = abs(sum(e for _, e in team1) - sum(e for _, e in team2))
+    return gap
+
+
+def assign_courts(player_elo, courts, time_limit=TIME_LIMIT):
+    """
+    Split players (exactly courts * 2 * team size of them) into courts.
+
+    Starts from a snake draft by ELO, then hill-climbs by swapping players
+    between courts to lower the worst court's gap (then the total gap). Each
+    court's two teams are the exact best split of its players.
+
+    Returns:
+        list: One Court(team1, team2, diff) per court.
+    """
+    elo_of = dict(player_elo)
+    ordered = sorted(elo_of, key=lambda name: (-elo_of[name], name))
+
+    # Snake draft: 0, 1, ..., n-1, n-1, ..., 0, ...
+    groups = [[] for _ in range(courts)]
+    for i, name in enumerate(ordered):
+        lap, pos = divmod(i, courts)
+        groups[pos if lap % 2 == 0 else courts - 1 - pos].append(name)
+
+    cache = {}
+    gaps = [_court_gap(group, elo_of, cache) for group in groups]
+    deadline = time.perf_counter() + time_limit
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        score = (max(gaps), sum(gaps))
+        # Work on the worst court first; any swap that improves the score is taken
+        worst = max(range(courts), key=lambda c: gaps[c])
+        for other in sorted(range(courts), key=lambda c: -gaps[c]):
+            if other == worst:
+                continue
+            for i, a in enumerate(groups[worst]):
+                for j, b in enumerate(groups[other]):
+                    if elo_of[a] == elo_of[b]:
+                        continue
+                    groups[worst][i], groups[other][j] = b, a
+                    new_gaps = list(gaps)
+                    new_gaps[worst] = _court_gap(groups[worst], elo_of, cache)
+                    new_gaps[other] = _court_gap(groups[other], elo_of, cache)
+                    if (max(new_gaps), sum(new_gaps)) < score:
+                        gaps = new_gaps
+                        improved = True
+                        break
+                    groups[worst][i], groups[other][j] = a, b
+                if improved or time.perf_counter() >= deadline:
+                    break
+            if improved or time.perf_counter() >= deadline:
+                break
+
+    result = []
+    for group in groups:
+        ordered_group = sorted(((name, elo_of[name]) for name in group), key=lambda p: p[1], reverse=True)
+        team1, team2 = balance_teams(ordered_group)
+        diff = abs(sum(e for _, e in team1) - sum(e for _, e in team2))
+        result.append(Court([n for n, _ in team1], [n for n, _ in team2], diff))
+    return result
+
+
+def team_size_for(num_players, courts, team_size=None):
+    """Players per team: as many as fit, up to MAX_TEAM_SIZE, unless given."""
+    size = team_size or min(MAX_TEAM_SIZE, num_players // (2 * courts))
+    if size < 1 or 2 * courts * size > num_players:
+        raise ValueError(f"Not enough players for {courts} court(s) of {size}v{size}.")
+    return size
+
+
+def schedule_round(player_elo, courts, team_size=None, sit_out_counts=None, seed=None, time_limit=TIME_LIMIT):
+    """
+    Plan one round across several courts.
+
+    Args:
+        player_elo (list): (name, elo) tuples for everyone present.
+        courts (int): Number of courts in play.
+        team_size (int): Players per team; defaults to as many as fit, up to 6.
+        sit_out_counts (dict): Name -> times sat out so far; the lowest sit out next.
+
+    Returns:
+        tuple: (list of Court, list of names sitting out).
+    """
+    rng = random.Random(seed)
+    size = team_size_for(len(player_elo), courts, team_size)
+    sitting_out = choose_sit_outs([name for name, _ in player_elo], 2 * courts * size, sit_out_counts or {}, rng)
+    resting = set(sitting_out)
+    playing = [(name, elo) for name, elo in player_elo if name not in resting]
+    return assign_courts(playing, courts, time_limit), sitting_out
+
+
+def plan_session(player_elo, courts, rounds, team_size=None, seed=None, time_limit=TIME_LIMIT):
+    """Plan several rounds, rotating sit-outs so everyone rests about equally often."""
+    rng = random.Random(seed)
+    sit_out_counts = {name: 0 for name, _ in player_elo}
+    plan = []
+    for _ in range(rounds):
+        round_courts, sitting_out = schedule_round(
+            player_elo, courts, team_size, sit_out_counts, rng.random(), time_limit
+        )
+        for name in sitting_out:
+            sit_out_counts[name] += 1
+        plan.append((round_courts, sitting_out))
+    return plan
@@ -0,0 +1,97 @@
+#
+#
+# PER-PLAYER RATING HISTORY FOR elo_project
+#
+# One row per player per match: [match id, date, player, pre, post, delta, streak],
+# the same layout as the Player History tab. In memory each player's rows are kept
+# as columns (one array per field), so a timeline is read without touching anyone else's.
+
+import uuid
+from array import array
+
+HISTORY_HEADERS = ["Match ID", "Date", "Player", "Pre", "Post", "Delta", "Streak"]
+
+
+def new_match_id():
+    """A short unique id tying a match's history rows together."""
+    return uuid.uuid4().hex[:12]
+
+
+def match_history_rows(match_id, match_date, player_stats, team1, team2, changes1, changes2):
+    """
+    History rows for one match, built after apply_match_result has updated player_stats.
+
+    Args:
+        changes1, changes2 (list): The ELO changes apply_match_result returned for each team.
+
+    Returns:
+        list: [match id, date, player, pre, post, delta, streak] rows, Team 1 first.
+    """
+    rows = []
+    for team, changes in ((team1, changes1), (team2, changes2)):
+        for player, delta in zip(team, changes):
+            post = player_stats[player]["elo"]
+            rows.append([match_id, match_date, player, post - delta, post, delta, player_stats[player]["streak"]])
+    return rows
+
+
+class Timeline:
+    """One player's history as columns, oldest match first."""
+
+    def __init__(self):
+        self.match_ids = []
+        self.dates = []
+        self.pre = array("q")
+        self.post = array("q")
+        self.delta = array("q")
+        self.streak = array("q")
+        self.seen = set()  # Match ids already recorded, so replays don't double up
+
+    def __len__(self):
+        return len(self.match_ids)
+
+    def append(self, match_id, match_date, pre, post, delta, streak):
+        """Record one match; returns False if this match is already in the timeline."""
+        if match_id in self.seen:
+            return False
+        self.seen.add(match_id)
+        self.match_ids.append(match_id)
+        self.dates.append(match_date)
+        self.pre.append(int(pre))
+        self.post.append(int(post))
+        self.delta.append(int(delta))
+        self.streak.append(int(streak))
+        return True
+
+    def rows(self, player):
+        return [
+            [self.match_ids[i], self.dates[i], player, self.pre[i], self.post[i], self.delta[i], self.streak[i]]
+            for i in range(len(self.match_ids))
+        ]
+
+
+class HistoryIndex:
+    """Player name -> Timeline, filled from history rows in the order they were logged."""
+
+    def __init__(self, rows=()):
+        self.timelines = {}
+        self.add(rows)
+
+    def add(self, rows):
+        """Add history rows, skipping any (match id, player) already present."""
+        for match_id, match_date, player, pre, post, delta, streak in rows:
+            timeline = self.timelines.get(player)
+            if timeline is None:
+                timeline = self.timelines[player] = Timeline()
+            timeline.append(match_id, match_date, pre, post, delta, streak)
+
+    def new_rows(self, rows):
+        """The rows whose (match id, player) isn't in the index yet."""
+        return [
+            row for row in rows
+            if row[2] not in self.timelines or row[0] not in self.timelines[row[2]].seen
+        ]
+
+    def rows(self, player):
+        timeline = self.timelines.get(player)
+        return timeline.rows(player) if timeline is not None else []
@@ -0,0 +1,211 @@
+#
+#
+# BULK IMPORT AND EXPORT FOR elo_project
+#
+# Players use the ELO_Data columns and matches the Match History columns. Files
+# are read and written a chunk of rows at a time, so a 100k-match history never
+# has to sit in memory as one list, and every chunk goes to storage as a single
+# batched write. .parquet files need pyarrow (pip install pyarrow); anything else
+# is treated as CSV.
+#   python elo_project.py import players players.csv
+#   python elo_project.py export matches history.parquet
+
+import csv
+import functools
+import itertools
+
+from elo_replay import normalize_match_date
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pa = pq = None
+
+CHUNK_SIZE = 10_000  # Rows per read and per storage write
+
+PLAYER_COLUMNS = ["Player Name", "Rating", "Matches", "Streak"]
+MATCH_COLUMNS = ["Date", "Team 1", "Team 2", "Score", "Match ID"]
+COLUMNS = {"players": PLAYER_COLUMNS, "matches": MATCH_COLUMNS}
+
+# A history has far fewer distinct dates than rows, so each is parsed once
+_match_date = functools.lru_cache(maxsize=4096)(normalize_match_date)
+
+
+def _is_parquet(path):
+    if not str(path).lower().endswith((".parquet", ".pq")):
+        return False
+    if pq is None:
+        raise RuntimeError("Reading and writing .parquet files needs pyarrow: pip install pyarrow")
+    return True
+
+
+def _schema(kind):
+    if kind == "players":
+        return pa.schema([
+            ("Player Name", pa.string()), ("Rating", pa.int64()),
+            ("Matches", pa.int64()), ("Streak", pa.int64()),
+        ])
+    return pa.schema([(column, pa.string()) for column in MATCH_COLUMNS])
+
+
+def _clean(kind, row, line):
+    """
+    Normalize one row to the storage layout, checking it the way replays will read it.
+    Returns None for a blank row; raises ValueError naming the line for a bad one.
+    """
+    # Empty Parquet cells come through as None
+    cells = ["" if cell is None else str(cell).strip() for cell in row]
+    if not "".join(cells):
+        return None
+    if kind == "players":
+        if len(cells) < 4:
+            raise ValueError(f"Line {line}: expected {', '.join(PLAYER_COLUMNS)}, got {row}")
+        name, elo, matches, streak = cells[:4]
+        try:
+            return [name, int(elo), int(matches), int(streak)]
+        except ValueError:
+            raise ValueError(f"Line {line}: rating, matches and streak must be whole numbers: {row}") from None
+
+    if len(cells) < 4:
+        raise ValueError(f"Line {line}: expected {', '.join(MATCH_COLUMNS[:4])}, got {row}")
+    match_date, team1, team2, score = cells[:4]
+    match_id = cells[4] if len(cells) > 4 else ""
+    if not team1 or not team2:
+        raise ValueError(f"Line {line}: both teams need at least one player: {row}")
+    try:
+        match_date = _match_date(match_date)
+    except ValueError as e:
+        raise ValueError(f"Line {line}: {e}") from None
+    try:
+        score1, score2 = map(int, score.split("-"))
+    except ValueError:
+        raise ValueError(f"Line {line}: score must look like 21-18, got {score!r}") from None
+    return [match_date, team1, team2, f"{score1}-{score2}", match_id]
+
+
+def read_chunks(path, kind, chunk_size=CHUNK_SIZE):
+    """
+    Yield lists of up to chunk_size rows from a players or matches file.
+
+    A CSV header row is skipped if it starts with the first column's name; Parquet
+    columns are read by name. Blank rows and player rows with no name are skipped.
+    """
+    columns = COLUMNS[kind]
+    if _is_parquet(path):
+        parquet = pq.ParquetFile(path)
+        wanted = [column for column in columns if column in parquet.schema_arrow.names]
+        line = 1
+        for batch in parquet.iter_batches(batch_size=chunk_size, columns=wanted):
+            values = [batch.column(column).to_pylist() for column in wanted]
+            chunk = []
+            for row in zip(*values):
+                chunk.append(_clean(kind, row, line))
+                line += 1
+            yield [row for row in chunk if row and row[0]]
+        return
+
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        line = 0
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                return
+            chunk = []
+            for row in rows:
+                line += 1
+                if not row or not "".join(row).strip():
+                    continue
+                if line == 1 and row[0].strip() == columns[0]:
+                    continue  # Header
+                chunk.append(_clean(kind, row, line))
+            yield [row for row in chunk if row and row[0]]
+
+
+def write_chunks(path, kind, chunks):
+    """Write an iterable of row lists to a players or matches file. Returns the rows written."""
+    columns = COLUMNS[kind]
+    written = 0
+    if _is_parquet(path):
+        schema = _schema(kind)
+        with pq.ParquetWriter(path, schema) as writer:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                padded = [list(row[:len(columns)]) + [""] * (len(columns) - len(row)) for row in chunk]
+                arrays = [
+                    pa.array([row[i] for row in padded], type=schema.field(i).type)
+                    for i in range(len(columns))
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                written += len(chunk)
+        return written
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for chunk in chunks:
+            writer.writerows(list(row[:len(columns)]) + [""] * (len(columns) - len(row)) for row in chunk)
+            written += len(chunk)
+    return written
+
+
+def _validate(path, kind, chunk_size):
+    """Read the whole file once so a bad line near the end fails before anything is written."""
+    for _ in read_chunks(path, kind, chunk_size):
+        pass
+
+
+def import_players(storage, path, chunk_size=CHUNK_SIZE):
+    """
+    Load players from a file: new names are appended and existing ones overwritten in
+    place, one add_players and one update_players write per chunk. Nothing is written
+    if any line is bad.
+
+    Returns:
+        tuple: (players added, players updated).
+    """
+    _validate(path, "players", chunk_size)
+    known = {row[0] for row in storage.load_players()}
+    added = updated = 0
+    for chunk in read_chunks(path, "players", chunk_size):
+        # A name repeated in the file keeps its last row
+        latest = {}
+        for row in chunk:
+            latest[row[0]] = row
+        new_rows = [row for name, row in latest.items() if name not in known]
+        existing_rows = [row for name, row in latest.items() if name in known]
+        if new_rows:
+            storage.add_players(new_rows)
+            known.update(row[0] for row in new_rows)
+        if existing_rows:
+            storage.update_players(existing_rows)
+        added += len(new_rows)
+        updated += len(existing_rows)
+    return added, updated
+
+
+def import_matches(storage, path, chunk_size=CHUNK_SIZE):
+    """
+    Append matches from a file, one append_matches write per chunk. Dates are stored as
+    MM-DD-YYYY; nothing is written if any line is bad. Returns the rows read.
+    """
+    _validate(path, "matches", chunk_size)
+    count = 0
+    for chunk in read_chunks(path, "matches", chunk_size):
+        if chunk:
+            storage.append_matches(chunk)
+            count += len(chunk)
+    return count
+
+
+def export_players(storage, path, chunk_size=CHUNK_SIZE):
+    """Write every player row to a file. Returns the number of rows written."""
+    rows = storage.load_players()
+    return write_chunks(path, "players", (rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)))
+
+
+def export_matches(storage, path, chunk_size=CHUNK_SIZE):
+    """Write the match history to a file, streamed from storage a chunk at a time."""
+    return write_chunks(path, "matches", storage.iter_matches(chunk_size))
@@ -0,0 +1,208 @@
+#
+#
+# WRITE-AHEAD MATCH JOURNAL FOR elo_project
+#
+# A match is appended (and fsync'd) to a local JSON-lines file before anything is
+# sent to storage, so the user doesn't wait on the network and a failure halfway
+# through a sync can't leave ratings and history out of step. A background thread
+# pushes journaled matches to storage in batches and then appends a "synced"
+# marker; whatever isn't marked is pushed again on the next start.
+#
+# Each match line looks like
+#   {"id": ..., "match": [date, team1, team2, score, id],
+#    "players": [[name, elo, matches, streak], ...], "history": [[...], ...]}
+# with the players' stats after the match, so pushing one twice is harmless.
+#
+# A match that can never sync (say a player was renamed in the sheet) is moved to
+# a "<journal>.failed" file with the error, so it doesn't hold up everything after it.
+
+import json
+import os
+import threading
+
+RETRY_DELAY = 5.0  # Seconds before retrying a failed sync; doubles up to MAX_RETRY_DELAY
+MAX_RETRY_DELAY = 120.0
+BATCH_SIZE = 50  # Matches pushed per sync
+# Failures that retrying won't fix, e.g. KeyError from a player missing in storage
+PERMANENT_ERRORS = (KeyError, ValueError)
+
+
+class MatchJournal:
+    """Append-only, fsync'd journal of match commits, with the unsynced ones kept in memory."""
+
+    def __init__(self, path):
+        self.path = path
+        self.failed_path = path + ".failed"
+        self.lock = threading.Lock()
+        self.pending = {}  # Match id -> entry, in journal order
+        self.file = None
+        self._load()
+
+    def _load(self):
+        """Read back the unsynced entries, dropping a line torn by a crash mid-write."""
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        complete = data[:data.rfind(b"\n") + 1]
+        if len(complete) != len(data):
+            # The last append never finished, so it was never acknowledged either
+            with open(self.path, "r+b") as f:
+                f.truncate(len(complete))
+                f.flush()
+                os.fsync(f.fileno())
+        for line in complete.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "synced" in record or "failed" in record:
+                for match_id in record.get("synced", record.get("failed")):
+                    self.pending.pop(match_id, None)
+            else:
+                self.pending[record["id"]] = record
+
+    def _write(self, records):
+        # Caller holds self.lock
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write("".join(json.dumps(record) + "\n" for record in records))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def append(self, entry):
+        """Durably record one match; it's safe from here on even if the process dies."""
+        with self.lock:
+            self._write([entry])
+            self.pending[entry["id"]] = entry
+
+    def mark_synced(self, match_ids):
+        with self.lock:
+            self._write([{"synced": list(match_ids)}])
+            for match_id in match_ids:
+                self.pending.pop(match_id, None)
+            if not self.pending:
+                self._compact()
+
+    def mark_failed(self, entry, error):
+        """Move an entry that can't be synced to the failed file, out of the pending set."""
+        with self.lock:
+            with open(self.failed_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(dict(entry, error=repr(error))) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._write([{"failed": [entry["id"]]}])
+            self.pending.pop(entry["id"], None)
+            if not self.pending:
+                self._compact()
+
+    def failed_entries(self):
+        """Entries set aside by mark_failed, each with an "error" key, oldest first."""
+        try:
+            with open(self.failed_path, encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _compact(self):
+        """Rewrite the file with only the unsynced entries (caller holds self.lock)."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in self.pending.values()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def pending_entries(self, limit=None):
+        """Unsynced entries, oldest first."""
+        with self.lock:
+            entries = list(self.pending.values())
+        return entries if limit is None else entries[:limit]
+
+    def pending_player_rows(self):
+        """Name -> latest [name, elo, matches, streak] from unsynced matches, which storage doesn't have yet."""
+        rows = {}
+        for entry in self.pending_entries():
+            for row in entry["players"]:
+                rows[row[0]] = row
+        return rows
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending)
+
+
+class JournalSyncer:
+    """Background thread that pushes a journal's unsynced matches to storage in batches."""
+
+    def __init__(self, journal, sync, batch_size=BATCH_SIZE, retry_delay=RETRY_DELAY, max_delay=MAX_RETRY_DELAY,
+                 permanent_errors=PERMANENT_ERRORS):
+        """
+        sync(entries) must write the entries to storage, skipping anything already there.
+        An entry whose sync raises one of permanent_errors is set aside instead of retried.
+        """
+        self.journal = journal
+        self.sync = sync
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.permanent_errors = permanent_errors
+        self.wake_event = threading.Event()
+        self.progress = threading.Condition()
+        self.thread = None
+        self.start_lock = threading.Lock()
+
+    def wake(self):
+        """Start the thread if needed and have it sync now."""
+        with self.start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="elo-journal-sync", daemon=True)
+                self.thread.start()
+        self.wake_event.set()
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            self.wake_event.wait()
+            self.wake_event.clear()
+            limit = self.batch_size
+            while True:
+                entries = self.journal.pending_entries(limit)
+                if not entries:
+                    break
+                try:
+                    self.sync(entries)
+                except self.permanent_errors as e:
+                    if len(entries) > 1:
+                        limit = 1  # Push one match at a time to find the one at fault
+                        continue
+                    print(f"Journaled match {entries[0]['id']} can't be synced ({e!r}); "
+                          f"moved to {self.journal.failed_path}.")
+                    self.journal.mark_failed(entries[0], e)
+                    limit = self.batch_size
+                    with self.progress:
+                        self.progress.notify_all()
+                    continue
+                except Exception as e:
+                    print(f"Syncing {len(entries)} journaled match(es) failed ({e}); retrying in {delay:.0f}s.")
+                    with self.progress:
+                        self.progress.notify_all()
+                    self.wake_event.wait(delay)
+                    self.wake_event.clear()
+                    delay = min(self.max_delay, delay * 2)
+                    continue
+                self.journal.mark_synced([entry["id"] for entry in entries])
+                delay = self.retry_delay
+                with self.progress:
+                    self.progress.notify_all()
+
+    def flush(self, timeout=None):
+        """Sync now and wait until nothing is pending. Returns False if that took longer than timeout."""
+        if not len(self.journal):
+            return True
+        self.wake()
+        with self.progress:
+            return self.progress.wait_for(lambda: not len(self.journal), timeout)
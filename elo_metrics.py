@@ -0,0 +1,159 @@
+#
+#
+# SHEETS API INSTRUMENTATION FOR elo_project
+#
+# Every worksheet handle is wrapped so each API call records its count, latency,
+# payload size and the elo_project function that triggered it.
+
+import concurrent.futures.thread
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+READ_OPERATIONS = {"get_all_records", "get_all_values", "col_values", "row_values", "get"}
+WRITE_OPERATIONS = {"update", "update_cell", "batch_update", "append_row", "append_rows"}
+
+# Frames from these files are plumbing; the caller is the first frame outside them.
+# Thread-pool internals count too, so calls on a worker fall back to call_origin.
+_PLUMBING_FILES = {
+    os.path.normcase(os.path.abspath(__file__)),
+    os.path.normcase(os.path.join(os.path.dirname(os.path.abspath(__file__)), "elo_storage.py")),
+    os.path.normcase(os.path.join(os.path.dirname(os.path.abspath(__file__)), "elo_scheduler.py")),
+    os.path.normcase(os.path.abspath(threading.__file__)),
+    os.path.normcase(os.path.abspath(concurrent.futures.thread.__file__)),
+}
+
+# The function that handed work to another thread, set by traced()
+call_origin = contextvars.ContextVar("call_origin", default="unknown")
+
+
+def _payload_size(value):
+    """Approximate bytes on the wire for a request body or response."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _caller():
+    """Name the first public function up the stack that isn't storage or metrics plumbing."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.normcase(os.path.abspath(frame.f_code.co_filename))
+        name = frame.f_code.co_name
+        # Skip private helpers and comprehensions/lambdas, but not module-level code
+        if filename not in _PLUMBING_FILES and not name.startswith("_") and (name == "<module>" or not name.startswith("<")):
+            module = os.path.splitext(os.path.basename(filename))[0]
+            return f"{module}.{name}"
+        frame = frame.f_back
+    return call_origin.get()
+
+
+def traced(fn):
+    """Wrap fn for a worker thread so its Sheets calls are credited to the function submitting it."""
+    origin = _caller()
+
+    def run(*args, **kwargs):
+        token = call_origin.set(origin)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            call_origin.reset(token)
+
+    return run
+
+
+class SheetsCallStats:
+    """Thread-safe per-(operation, caller) counters for Sheets API calls."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.entries = {}
+            self.read_times = deque()  # For the rolling per-minute read count
+
+    def record(self, operation, caller, seconds, payload, failed=False):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.setdefault((operation, caller), {
+                "operation": operation, "caller": caller, "calls": 0, "errors": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "payload_bytes": 0,
+            })
+            entry["calls"] += 1
+            entry["errors"] += int(failed)
+            entry["total_ms"] += seconds * 1000
+            entry["max_ms"] = max(entry["max_ms"], seconds * 1000)
+            entry["payload_bytes"] += payload
+            if operation in READ_OPERATIONS:
+                self.read_times.append(now)
+
+    def reads_last_minute(self):
+        """Reads in the last 60 seconds; Sheets allows 60 per minute per user."""
+        cutoff = time.monotonic() - 60
+        with self.lock:
+            while self.read_times and self.read_times[0] < cutoff:
+                self.read_times.popleft()
+            return len(self.read_times)
+
+    def snapshot(self):
+        """Return one dict per (operation, caller), busiest first."""
+        with self.lock:
+            rows = [dict(entry) for entry in self.entries.values()]
+        for row in rows:
+            row["avg_ms"] = round(row["total_ms"] / row["calls"], 1)
+            row["total_ms"] = round(row["total_ms"], 1)
+            row["max_ms"] = round(row["max_ms"], 1)
+        return sorted(rows, key=lambda row: (-row["calls"], row["operation"], row["caller"]))
+
+    def format_table(self):
+        """Plain-text table of the snapshot for the CLI."""
+        rows = self.snapshot()
+        if not rows:
+            return "No Sheets API calls recorded."
+        lines = [f"{'operation':<16} {'caller':<36} {'calls':>5} {'errors':>6} {'avg ms':>8} {'max ms':>8} {'bytes':>9}"]
+        for row in rows:
+            lines.append(
+                f"{row['operation']:<16} {row['caller']:<36} {row['calls']:>5} {row['errors']:>6}"
+                f" {row['avg_ms']:>8} {row['max_ms']:>8} {row['payload_bytes']:>9}"
+            )
+        lines.append(f"Reads in the last minute: {self.reads_last_minute()}")
+        return "\n".join(lines)
+
+
+# Shared by every worksheet in the process
+sheets_stats = SheetsCallStats()
+
+
+class InstrumentedWorksheet:
+    """Wraps a gspread worksheet and records every read and write API call in sheets_stats."""
+
+    def __init__(self, worksheet, stats=sheets_stats):
+        self.worksheet = worksheet
+        self.stats = stats
+
+    def __getattr__(self, name):
+        attribute = getattr(self.worksheet, name)
+        if name not in READ_OPERATIONS and name not in WRITE_OPERATIONS:
+            return attribute
+
+        def call(*args, **kwargs):
+            caller = _caller()
+            start = time.perf_counter()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception:
+                self.stats.record(name, caller, time.perf_counter() - start, 0, failed=True)
+                raise
+            elapsed = time.perf_counter() - start
+            payload = _payload_size(result if name in READ_OPERATIONS else [args, kwargs])
+            self.stats.record(name, caller, elapsed, payload)
+            return result
+
+        return call
@@ -0,0 +1,191 @@
+#
+#
+# PLAYER STATS CONTAINERS FOR elo_project
+
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+
+FIELDS = ("elo", "matches", "streak")
+
+
+class PlayerRow(Mapping):
+    """
+    Dict-style view of one player in a PlayerTable ("Player Name", "elo", "matches",
+    "streak"). Reads and writes go straight to the table's arrays; a write that
+    changes a value marks the player dirty.
+    """
+
+    __slots__ = ("table", "pid")
+
+    def __init__(self, table, pid):
+        self.table = table
+        self.pid = pid
+
+    def __getitem__(self, key):
+        if key == "Player Name":
+            return self.table.names[self.pid]
+        return self.table.columns[key][self.pid]
+
+    def __setitem__(self, key, value):
+        column = self.table.columns[key]
+        if column[self.pid] != value:
+            column[self.pid] = value
+            self.table.dirty.add(self.pid)
+
+    def __iter__(self):
+        return iter(("Player Name",) + FIELDS)
+
+    def __len__(self):
+        return len(FIELDS) + 1
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class PlayerTable(Mapping):
+    """
+    Player name -> stats, stored as one int array per field with names interned
+    to ids, instead of a dict per player. Indexing by name gives a PlayerRow, so
+    code written for the old dict of dicts (calculate_elo_change, get_baseline,
+    sort_leaderboard) works unchanged; hot loops can use ids and the arrays directly.
+
+    Remembers which players changed since it was loaded, so only those rows get
+    written back.
+    """
+
+    def __init__(self, stats=()):
+        self.ids = {}  # Name -> id (index into names and the arrays)
+        self.names = []
+        self.columns = {field: array("q") for field in FIELDS}
+        self.elo = self.columns["elo"]
+        self.matches = self.columns["matches"]
+        self.streak = self.columns["streak"]
+        self.dirty = set()  # Ids of changed players
+        for name, player in dict(stats).items():
+            self.set_row(self.intern(name), player["elo"], player["matches"], player["streak"])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a table from [name, elo, matches, streak] rows; blank names are skipped."""
+        table = cls()
+        for name, elo, matches, streak in rows:
+            if name:
+                table.set_row(table.intern(name), elo, matches, streak)
+        return table
+
+    def intern(self, name, elo=0, matches=0, streak=0):
+        """Return the player's id, adding them with the given stats if they're new."""
+        pid = self.ids.get(name)
+        if pid is None:
+            pid = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.elo.append(elo)
+            self.matches.append(matches)
+            self.streak.append(streak)
+        return pid
+
+    def set_row(self, pid, elo, matches, streak):
+        self.elo[pid] = elo
+        self.matches[pid] = matches
+        self.streak[pid] = streak
+
+    def __getitem__(self, name):
+        return PlayerRow(self, self.ids[name])
+
+    def __setitem__(self, name, stats):
+        pid = self.intern(name)
+        self.set_row(pid, stats["elo"], stats["matches"], stats["streak"])
+        self.dirty.add(pid)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def row(self, pid):
+        """[name, elo, matches, streak] for one player id."""
+        return [self.names[pid], self.elo[pid], self.matches[pid], self.streak[pid]]
+
+    def rows(self):
+        return [self.row(pid) for pid in range(len(self.names))]
+
+    def dirty_rows(self):
+        """Return [name, elo, matches, streak] rows for every changed player."""
+        return [self.row(pid) for pid in sorted(self.dirty)]
+
+    def mark_clean(self):
+        self.dirty.clear()
+
+
+def to_row(stats):
+    """Convert a stats dict to a [name, elo, matches, streak] sheet row."""
+    return [stats["Player Name"], stats["elo"], stats["matches"], stats["streak"]]
+
+
+class Leaderboard:
+    """
+    Players ranked by ELO (highest first, ties by name), kept sorted as ratings change
+    so rank lookups and top-N / page queries never re-sort the whole table.
+    """
+
+    def __init__(self, rows=()):
+        self.keys = []  # Sorted (-elo, name)
+        self.rows = {}  # Name -> [name, elo, matches, streak]
+        self.sync(rows)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def update(self, row):
+        """Insert or replace one player's row, moving them to their new rank."""
+        name = row[0]
+        old = self.rows.get(name)
+        if old is not None:
+            if old[1] != row[1]:
+                del self.keys[bisect_left(self.keys, (-old[1], name))]
+                insort(self.keys, (-row[1], name))
+        else:
+            insort(self.keys, (-row[1], name))
+        self.rows[name] = list(row)
+
+    def remove(self, name):
+        old = self.rows.pop(name, None)
+        if old is not None:
+            del self.keys[bisect_left(self.keys, (-old[1], name))]
+
+    def sync(self, rows):
+        """Make the index match rows, touching only the players whose row changed."""
+        seen = set()
+        for row in rows:
+            if not row[0]:
+                continue
+            seen.add(row[0])
+            if self.rows.get(row[0]) != list(row):
+                self.update(row)
+        for name in [name for name in self.rows if name not in seen]:
+            self.remove(name)
+
+    def rank(self, name):
+        """1-based rank of a player, or None if they aren't on the board."""
+        row = self.rows.get(name)
+        if row is None:
+            return None
+        return bisect_left(self.keys, (-row[1], name)) + 1
+
+    def top(self, n=None):
+        """The first n rows (all of them if n is None)."""
+        keys = self.keys if n is None else self.keys[:n]
+        return [list(self.rows[name]) for _, name in keys]
+
+    def page(self, page, size):
+        """Rows for a 1-based page of the given size."""
+        start = (page - 1) * size
+        return [list(self.rows[name]) for _, name in self.keys[start:start + size]]
@@ -8,24 +8,26 @@ import gspread
 from google.oauth2.service_account import Credentials
 from math import pow
 from datetime import datetime
-from itertools import combinations
 import streamlit as st
+import atexit
+import concurrent.futures
+import csv
 import json
-
-st.write(st.secrets["GOOGLE_CREDS"])
-
-# Load Google Credentials from Streamlit secrets
-creds_data = st.secrets["GOOGLE_CREDS"]
-
-# If it's a string, parse it; otherwise, use it as is
-if isinstance(creds_data, str):
-    creds_dict = json.loads(creds_data)  # Convert JSON string to dict
-else:
-    creds_dict = creds_data  # It's already a dictionary
-
-# Authenticate with Google Sheets
-credentials = Credentials.from_service_account_info(creds_dict)# scopes=["https://www.googleapis.com/auth/spreadsheets"])
-client = gspread.authorize(credentials)
+import os
+import sys
+import threading
+import time
+from elo_balancer import balance_teams, best_splits
+from elo_courts import plan_session
+import elo_io
+from elo_history import HISTORY_HEADERS, match_history_rows, new_match_id
+from elo_journal import JournalSyncer, MatchJournal
+from elo_metrics import InstrumentedWorksheet, call_origin, sheets_stats, traced
+from elo_scheduler import ScheduledWorksheet
+from elo_players import Leaderboard, PlayerTable, to_row
+from elo_rating import DEFAULT_ELO, K_FACTOR, RATING_MODES, get_baseline, calculate_elo_change, apply_match_result, win_probability
+from elo_replay import normalize_match_date, replay_history
+from elo_storage import SheetsStorage, SQLiteStorage
 
 # Google Sheets authentication
 #SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
@@ -39,85 +41,281 @@ SPREADSHEET_NAME = "Volleyball ELO Tracker"
 SHEET_NAME = "ELO_Data"
 PLAYER_TAB_NAME = "ELO_Data"
 MATCH_HISTORY_TAB_NAME = "Match History"
+PLAYER_HISTORY_TAB_NAME = "Player History"
+
+# Tabs that are created (with this header row) the first time they're needed
+NEW_TAB_HEADERS = {PLAYER_HISTORY_TAB_NAME: HISTORY_HEADERS}
 
 # Constants
-DEFAULT_ELO = 1000
-K_FACTOR = 32
+PLAYER_HEADERS = ["Player Name", "Rating", "Matches", "Streak"]
+PLAYER_CACHE_TTL = 60  # Seconds before cached player data is downloaded again
+
+# Storage engine: "sheets" (default) or "sqlite" for a local database file
+STORAGE_ENGINE = os.environ.get("ELO_STORAGE", "sheets")
+SQLITE_PATH = os.environ.get("ELO_SQLITE_PATH", "elo.db")
+
+# Rating model: "baseline" (the ladder/streak/margin rule) or "expected" (classic Elo with K_FACTOR)
+RATING_MODE = os.environ.get("ELO_RATING_MODE", "baseline")
+if RATING_MODE not in RATING_MODES:
+    raise ValueError(f"ELO_RATING_MODE must be one of {RATING_MODES}, not {RATING_MODE!r}")
+
+# Matches are journaled here before they're sent to storage; set it to "" to write directly
+JOURNAL_PATH = os.environ.get("ELO_JOURNAL_PATH", "elo_journal.jsonl")
+JOURNAL_FLUSH_TIMEOUT = 60  # Seconds a direct write waits for journaled matches to sync first
+JOURNAL_EXIT_TIMEOUT = 10  # Seconds spent syncing on exit; anything left syncs on the next start
+
+# Nothing below touches the network until a worksheet is actually needed;
+# st.cache_resource keeps the handles for the life of the server process
+@st.cache_resource
+def get_client():
+    """Authenticate with Google Sheets using the credentials in Streamlit secrets."""
+    creds_data = st.secrets["GOOGLE_CREDS"]
+
+    # If it's a string, parse it; otherwise, use it as is
+    if isinstance(creds_data, str):
+        creds_dict = json.loads(creds_data)  # Convert JSON string to dict
+    else:
+        creds_dict = creds_data  # It's already a dictionary
+
+    credentials = Credentials.from_service_account_info(creds_dict)# scopes=["https://www.googleapis.com/auth/spreadsheets"])
+    return gspread.authorize(credentials)
+
+@st.cache_resource
+def get_spreadsheet():
+    """Open the spreadsheet."""
+    return get_client().open(SPREADSHEET_NAME)
+
+@st.cache_resource
+def get_worksheet(tab_name):
+    """
+    Open one tab of the spreadsheet. Its API calls go through the shared request scheduler
+    (coalescing, rate limiting, retries) and every attempt is counted in sheets_stats.
+    """
+    spreadsheet = get_spreadsheet()
+    try:
+        worksheet = spreadsheet.worksheet(tab_name)
+    except gspread.WorksheetNotFound:
+        if tab_name not in NEW_TAB_HEADERS:
+            raise
+        headers = NEW_TAB_HEADERS[tab_name]
+        worksheet = spreadsheet.add_worksheet(title=tab_name, rows=1000, cols=len(headers))
+        worksheet.append_row(headers)
+    return ScheduledWorksheet(InstrumentedWorksheet(worksheet))
+
+def print_sheets_stats():
+    """Print how many Sheets API calls each function made, with latency and payload size."""
+    print(sheets_stats.format_table())
+
+# Set ELO_SHEETS_STATS=1 to get the table when a CLI session exits
+if os.environ.get("ELO_SHEETS_STATS"):
+    atexit.register(print_sheets_stats)
+
+# Independent storage requests (a stats write and a history append) run on this
+# pool at the same time instead of one after the other
+_io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="elo-io")
+
+def _run_concurrently(*calls):
+    """Run (function, *args) calls on the I/O pool at once; wait for all, then return their results."""
+    futures = [_io_pool.submit(traced(fn), *args) for fn, *args in calls]
+    concurrent.futures.wait(futures)
+    return [future.result() for future in futures]  # Re-raises the first failure
+
+# Every read and write below goes through this backend
+sheets_storage = SheetsStorage(get_worksheet, PLAYER_TAB_NAME, MATCH_HISTORY_TAB_NAME, PLAYER_HISTORY_TAB_NAME)
+if STORAGE_ENGINE == "sqlite":
+    storage = SQLiteStorage(SQLITE_PATH)
+else:
+    storage = sheets_storage
 
-# Access the spreadsheet and worksheet
-spreadsheet = client.open(SPREADSHEET_NAME)
-elo_sheet = spreadsheet.worksheet(SHEET_NAME)
-player_sheet = spreadsheet.worksheet(PLAYER_TAB_NAME)
-match_sheet = spreadsheet.worksheet(MATCH_HISTORY_TAB_NAME)
+def sync_to_sheets():
+    """Push the local SQLite data to Google Sheets (no-op when already using Sheets)."""
+    if storage is sheets_storage:
+        return
+    synced = storage.sync_to(sheets_storage)
+    print(f"Synced player table and {synced} match(es) to Google Sheets.")
+
+# Cached copy of the player rows, shared by every reader in this process, plus a
+# ranking index kept in step with it so the leaderboard is never re-sorted from scratch
+_player_cache = {"rows": None, "fetched_at": 0.0}
+_player_cache_lock = threading.Lock()
+_leaderboard = Leaderboard()
+
+def _get_player_records():
+    """Return the player rows as records, reading storage only when the cache is empty or stale."""
+    with _player_cache_lock:
+        age = time.monotonic() - _player_cache["fetched_at"]
+        if _player_cache["rows"] is None or age > PLAYER_CACHE_TTL:
+            rows = storage.load_players()
+            if journal is not None:
+                # Matches still in the journal are newer than what storage holds
+                pending = journal.pending_player_rows()
+                if pending:
+                    rows = [pending.get(row[0], row) for row in rows]
+            _player_cache["rows"] = [dict(zip(PLAYER_HEADERS, row)) for row in rows]
+            _player_cache["fetched_at"] = time.monotonic()
+            _leaderboard.sync(rows)
+        return _player_cache["rows"]
+
+def _cache_player_rows(rows, append=False):
+    """Write-through: mirror rows just written to storage into the cache."""
+    records = [dict(zip(PLAYER_HEADERS, row)) for row in rows]
+    with _player_cache_lock:
+        if append:
+            if _player_cache["rows"] is None:
+                return  # Nothing cached yet; the next read picks the rows up
+            records = _player_cache["rows"] + records
+            for row in rows:
+                _leaderboard.update(row)
+        else:
+            _leaderboard.sync(rows)
+        _player_cache["rows"] = records
+        _player_cache["fetched_at"] = time.monotonic()
+
+def _cache_update_rows(rows):
+    """Write-through for in-place updates: replace the cached rows of these players."""
+    by_name = {row[0]: row for row in rows}
+    with _player_cache_lock:
+        for record in _player_cache["rows"] or []:
+            row = by_name.get(record["Player Name"])
+            if row is not None:
+                record.update(zip(PLAYER_HEADERS, row))
+                _leaderboard.update(row)
+
+def invalidate_player_cache():
+    """Drop the cached player rows so the next read goes to the sheet."""
+    with _player_cache_lock:
+        _player_cache["rows"] = None
+
+def _sync_journal(entries):
+    """
+    Write journaled matches to storage: the players' latest stats first, then the history.
+    Appends skip match ids storage already has and the stats are absolute, so pushing
+    an entry again after a failure part-way through is harmless.
+
+    The player cache is left alone: log_match already put these rows there, and a
+    match logged since then may have moved the same players on again.
+    """
+    latest = {}
+    for entry in entries:
+        for row in entry["players"]:
+            latest[row[0]] = row
+    # This runs on the syncer thread; credit its Sheets calls to the function that journaled the matches
+    token = call_origin.set("elo_project.log_match")
+    try:
+        # Stats first: update_players raises KeyError, before writing anything, for a player
+        # missing from storage, so an entry set aside for that left no history behind
+        storage.update_players(list(latest.values()))
+        storage.append_matches([entry["match"] for entry in entries])
+        storage.append_history([row for entry in entries for row in entry["history"]])
+    finally:
+        call_origin.reset(token)
+
+# Anything left unsynced by the last run is pushed again as soon as we start
+journal = MatchJournal(JOURNAL_PATH) if JOURNAL_PATH else None
+journal_syncer = JournalSyncer(journal, _sync_journal) if journal is not None else None
+def _flush_journal_at_exit():
+    if not flush_journal(JOURNAL_EXIT_TIMEOUT):
+        print(f"{len(journal)} match(es) are still in {JOURNAL_PATH}; they'll sync on the next start.")
+
+if journal is not None:
+    atexit.register(_flush_journal_at_exit)
+    if len(journal):
+        print(f"Syncing {len(journal)} journaled match(es) left over from the last run.")
+        journal_syncer.wake()
+
+def flush_journal(timeout=JOURNAL_FLUSH_TIMEOUT):
+    """Wait for journaled matches to reach storage. Returns False if they haven't within timeout."""
+    return journal_syncer.flush(timeout) if journal is not None else True
+
+def failed_journal_entries():
+    """Journaled matches that couldn't be synced (e.g. a player missing from the sheet), with the error."""
+    return journal.failed_entries() if journal is not None else []
+
+def _settle_journal():
+    """
+    Called before writing player stats directly: a journaled match that synced afterwards
+    would put its (older) stats back over the new ones.
+    """
+    if not flush_journal():
+        raise RuntimeError(
+            f"{len(journal)} journaled match(es) haven't reached storage yet; try again in a minute."
+        )
 
 # Test
 def get_all_names():
-    expected_headers = ["Player Name"]
-    data = player_sheet.get_all_records(expected_headers=expected_headers)
+    data = _get_player_records()
     return {row['Player Name'] for row in data}
 
 # Get all player data
 def get_all_players():
     """Fetch all player names and their ELO ratings."""
-    data = player_sheet.get_all_records()
+    data = _get_player_records()
     return {row['Player Name']: row['Rating'] for row in data}
 
 def get_player_stats():
-    """Fetch all player stats from the Google Sheet and return them as a dictionary."""
-    try:
-        # Define the expected headers (adjust them to match your sheet headers)
-        expected_headers = ["Player Name", "Rating", "Matches", "Streak"]
-        
-        # Fetch all records with expected headers
-        records = player_sheet.get_all_records(expected_headers=expected_headers)
-
-        # Convert the list of records into a dictionary keyed by player name
-        player_stats = {
-            record["Player Name"]: {
-                "Player Name": record["Player Name"],
-                "elo": int(record["Rating"]),
-                "matches": int(record["Matches"]),
-                "streak": int(record["Streak"]),
-            }
-            for record in records if record["Player Name"]
-        }
-        
-        return player_stats
-    except Exception as e:
-        print(f"Error fetching player stats: {e}")
-        return {}
+    """
+    Fetch all player stats from the Google Sheet and return them as a PlayerTable
+    (name -> stats, indexed like a dictionary).
+
+    Quota and server errors are retried with backoff by the request scheduler; if the
+    sheet still can't be read the error is raised rather than returning empty stats
+    (which used to make create_match_button give everyone the default ELO).
+    """
+    # Fetch all records (served from the cache when it is fresh)
+    records = _get_player_records()
+
+    # Convert the list of records into a table keyed by player name (indexed like a
+    # dict of dicts). PlayerTable tracks which players get changed so writes can skip the rest.
+    player_stats = PlayerTable.from_rows(
+        (record["Player Name"], int(record["Rating"]), int(record["Matches"]), int(record["Streak"]))
+        for record in records
+    )
+    
+    return player_stats
 
 def update_google_sheet(player_stats):
     """Update the Google Sheets with the player stats."""
-    data_to_update = []
-    
-    # Iterate over the player stats to prepare data for batch update
-    for i, (player, stats) in enumerate(player_stats.items(), start=2):
-        row = [stats["Player Name"], stats["elo"], stats["matches"], stats["streak"]]
-        data_to_update.append({
-            'range': f'A{i}:D{i}',  # Update the row for the player
-            'values': [row]  # The row of data to write
-        })
-    
-    # Perform batch update of all player data
-    player_sheet.batch_update(data_to_update)
+    if isinstance(player_stats, PlayerTable):
+        # Only the players that changed since the stats were loaded
+        rows = player_stats.dirty_rows()
+        storage.update_players(rows)
+        _cache_update_rows(rows)
+        player_stats.mark_clean()
+    else:
+        # Write all player rows in one request
+        rows = [to_row(stats) for stats in player_stats.values()]
+        storage.save_players(rows)
+        _cache_player_rows(rows)
     print("Google Sheet updated successfully.")
 
+def add_players(player_names):
+    """Add many new players with the default ELO in a single write. Returns the names added."""
+    players = get_all_players()  # Served from the cache, so no extra read
+    new_names = []
+    for name in player_names:
+        name = name.strip()
+        if not name:
+            continue
+        if name in players or name in new_names:
+            print(f"Player {name} already exists!")
+            continue
+        new_names.append(name)
+
+    if not new_names:
+        return []
+
+    # Append all new rows at once: name, ELO, matches played, streak.
+    # The sheet isn't re-sorted here; the next sort_leaderboard puts them in place.
+    rows = [[name, DEFAULT_ELO, 0, 0] for name in new_names]
+    storage.add_players(rows)
+    _cache_player_rows(rows, append=True)
+    print(f"Added {len(new_names)} player(s) with default ELO of {DEFAULT_ELO}.")
+    return new_names
+
 def add_player(player_name):
     """Add a new player to the sheet with the default ELO."""
-    players = get_all_players()
-    if player_name in players:
-        print(f"Player {player_name} already exists!")
-        return
-
-    # Add new player to the next available row
-    next_row = len(players) + 2  # Account for header row
-    player_sheet.update_cell(next_row, 1, player_name)
-    player_sheet.update_cell(next_row, 2, DEFAULT_ELO)
-    player_sheet.update_cell(next_row, 3, 0)  # Matches Played
-    player_sheet.update_cell(next_row, 4, 0)  # Streak
-    print(f"Player {player_name} added with default ELO of {DEFAULT_ELO}.")
-    sort_leaderboard()
+    if add_players([player_name]):
+        print(f"Player {player_name} added with default ELO of {DEFAULT_ELO}.")
 
 # Update a player's ELO rating
 def update_player_elo(player_name, new_elo):
@@ -127,34 +325,62 @@ def update_player_elo(player_name, new_elo):
         print(f"Player {player_name} not found! Adding them as a new player.")
         add_player(player_name)
 
-    # Find the row of the player
-    data = player_sheet.get_all_records()
-    row = next(i + 2 for i, p in enumerate(data) if p['Player Name'] == player_name)
-    player_sheet.update_cell(row, 2, new_elo)
+    # One write; the storage backend already knows which row the player is on
+    _settle_journal()
+    storage.set_rating(player_name, new_elo)
+    with _player_cache_lock:
+        for record in _player_cache["rows"] or []:
+            if record['Player Name'] == player_name:
+                record['Rating'] = new_elo
+                _leaderboard.update([record[header] for header in PLAYER_HEADERS])
     print(f"Player {player_name}'s ELO updated to {new_elo}.")
 
+# Read the leaderboard (from the ranking index; no sorting happens here)
+def get_leaderboard(top=None):
+    """Return [name, elo, matches, streak] rows sorted by ELO, highest first (only the first `top` if given)."""
+    _get_player_records()  # Refresh the index if the cache is stale
+    with _player_cache_lock:
+        return _leaderboard.top(top)
+
+def get_leaderboard_page(page, size=25):
+    """Return one 1-based page of the leaderboard and the total number of players."""
+    _get_player_records()
+    with _player_cache_lock:
+        return _leaderboard.page(page, size), len(_leaderboard)
+
+def get_player_rank(player_name):
+    """Return a player's 1-based leaderboard rank, or None if they aren't on it."""
+    _get_player_records()
+    with _player_cache_lock:
+        return _leaderboard.rank(player_name)
+
 # Sort leaderboard by ELO in descending order
 def sort_leaderboard(player_stats):
     """Sort the leaderboard and update Google Sheets in a single batch."""
     try:
-        # Retrieve player data and sort by ELO in descending order
-        sorted_players = sorted(player_stats.items(), key=lambda x: x[1]["elo"], reverse=True)
-
-        # Prepare sorted data for the Google Sheets update
-        rows_to_update = []
-        for player, stats in sorted_players:
-            rows_to_update.append([player, stats["elo"], stats["matches"], stats["streak"]])
-
-        # Define the range to update all rows
-        range_to_update = f"A2:D{len(sorted_players) + 1}"
-        
-        # Correct order of arguments or use named arguments
-        player_sheet.update(range_name=range_to_update, values=rows_to_update)
-
+        _write_sorted_players(player_stats)
         print("Leaderboard sorted and updated successfully.")
     except Exception as e:
         print(f"Failed to sort leaderboard: {e}")
 
+def _write_sorted_players(player_stats):
+    """Write the player rows sorted by ELO; raises if the write fails, leaving the cache as it was."""
+    # Retrieve player data and sort by ELO in descending order
+    sorted_players = sorted(player_stats.items(), key=lambda x: x[1]["elo"], reverse=True)
+
+    # Prepare sorted data for the Google Sheets update
+    rows_to_update = []
+    for player, stats in sorted_players:
+        rows_to_update.append([player, stats["elo"], stats["matches"], stats["streak"]])
+
+    # Write the sorted rows; the backend skips rows the sheet already holds
+    storage.save_players(rows_to_update)
+    _cache_player_rows(rows_to_update)
+    if isinstance(player_stats, PlayerTable):
+        player_stats.mark_clean()
+
+_commit_lock = threading.Lock()
+
 # Log match details in the Match History tab
 def log_match(team1, team2, score):
     """Log match details and update stats."""
@@ -162,103 +388,198 @@ def log_match(team1, team2, score):
     team2_names = [name.strip() for name in team2.split(",")]
     score1, score2 = map(int, score.split("-"))
 
-    player_stats = get_player_stats()
-    
-    # Calculate ELO changes
-    team1_elo = [player_stats[name]["elo"] for name in team1_names]
-    team2_elo = [player_stats[name]["elo"] for name in team2_names]
-    changes1, changes2 = calculate_elo_change(team1_elo, team2_elo, score1, score2, player_stats, team1, team2)
-
-    # Update stats for Team 1
-    for idx, player in enumerate(team1):
-        player_stats[player]["elo"] += changes1[idx]
-        player_stats[player]["matches"] += 1
-        # Adjust the streak depending on the score comparison
-        if score1 > score2:  # Winning streak
-            player_stats[player]["streak"] += 1
-        elif score1 < score2:  # Losing streak
-            player_stats[player]["streak"] -= 1
-
-    # Update stats for Team 2
-    for idx, player in enumerate(team2):
-        player_stats[player]["elo"] += changes2[idx]
-        player_stats[player]["matches"] += 1
-        # Adjust the streak depending on the score comparison
-        if score2 > score1:  # Winning streak
-            player_stats[player]["streak"] += 1
-        elif score2 < score1:  # Losing streak
-            player_stats[player]["streak"] -= 1
-
-    update_google_sheet(player_stats)
-    match_date = datetime.now().strftime("%m-%d-%Y")
-    match_sheet.append_row([match_date, ",".join(team1_names), ",".join(team2_names), score])
-    print("Match logged and stats updated.")
-    
-# Calculate the baseline ELO for each player based on their match history
-def get_baseline(player_stats, player):
-    """Calculate the baseline ELO for each player based on their match history."""
-    if player not in player_stats:
-        print(f"Player {player} not found in player stats!")
-        return 40  # Default baseline ELO if player is not found
-
-    matches = player_stats[player]["matches"]
-    #print(matches)
-    if matches < 2:
-        return 40
-    elif matches < 4:
-        return 35
-    elif matches < 6:
-        return 30
-    elif matches < 8:
-        return 25
-    elif matches < 10:
-        return 20
-    else:
-        return 15
-
-# Calculate the ELO changes after the matches
-def calculate_elo_change(team1_elo, team2_elo, score1, score2, player_stats, team1, team2):
-    #team1_avg_elo = sum(team1_elo) / len(team1_elo)
-    #team2_avg_elo = sum(team2_elo) / len(team2_elo)
-    margin = abs(score1 - score2)
-
-    #expected1 = 1 / (1 + 10 ** ((team2_avg_elo - team1_avg_elo) / 400))
-    #expected2 = 1 / (1 + 10 ** ((team1_avg_elo - team2_avg_elo) / 400))
+    # One commit at a time, so two matches logged at once can't both start from the same ratings
+    with _commit_lock:
+        player_stats = get_player_stats()
+
+        # Calculate ELO changes and update elo, matches and streak for both teams
+        changes1, changes2 = apply_match_result(player_stats, team1_names, team2_names, score1, score2, RATING_MODE)
+
+        match_id = new_match_id()
+        match_date = datetime.now().strftime("%m-%d-%Y")
+        match_row = [match_date, ",".join(team1_names), ",".join(team2_names), score, match_id]
+        player_history = match_history_rows(
+            match_id, match_date, player_stats, team1_names, team2_names, changes1, changes2
+        )
+
+        if journal is None:
+            # The stats write and the history appends don't depend on each other, so send them at once
+            _run_concurrently(
+                (update_google_sheet, player_stats),
+                (storage.append_match, match_row),
+                (storage.append_history, player_history),
+            )
+            print("Match logged and stats updated.")
+            return
+
+        # Journal first (fsync'd); from here the match survives a crash or a Sheets outage.
+        # The background syncer sends it to storage, and the cache shows it right away.
+        rows = player_stats.dirty_rows()
+        journal.append({"id": match_id, "match": match_row, "players": rows, "history": player_history})
+        _cache_update_rows(rows)
+        player_stats.mark_clean()
+    journal_syncer.wake()
+    print("Match logged; stats will sync in the background.")
+
+# Log a whole session of matches at once
+def log_matches(matches):
+    """
+    Apply many matches in order with one stats read, one stats write and one history append.
 
-    result1 = 1 if score1 > score2 else -1
-    result2 = 1 if score2 > score1 else -1
+    Args:
+        matches (list): (team1, team2, score) or (team1, team2, score, date) tuples. Teams are
+            lists of names or comma-separated strings; score is "21-18"; date is MM-DD-YYYY
+            (YYYY-MM-DD and MM/DD/YYYY are converted) and defaults to today.
 
-    margin_adjustment = min(5, margin // 3) if margin >= 3 else 0
-    #elo_diff_adjustment = int(abs(team1_avg_elo - team2_avg_elo) / 100) * 3
-    #if team1_avg_elo > team2_avg_elo:
-        #elo_diff_adjustment *= -1
+    Returns:
+        int: Number of matches logged (0 if any player, score or date is bad; nothing is written then).
+            Raises if the stats can't be saved; the histories aren't written then either.
+    """
+    today = datetime.now().strftime("%m-%d-%Y")
+    parsed = []
+    bad_dates = []
+    bad_scores = []
+    for match in matches:
+        team1, team2, score = match[:3]
+        if isinstance(team1, str):
+            team1 = team1.split(",")
+        if isinstance(team2, str):
+            team2 = team2.split(",")
+        team1 = [name.strip() for name in team1]
+        team2 = [name.strip() for name in team2]
+        try:
+            score1, score2 = map(int, str(score).split("-"))
+        except ValueError:
+            bad_scores.append(str(score))
+            continue
+        match_date = today
+        if len(match) > 3 and match[3]:
+            # Stored the way rebuild_ratings reads it, or the whole history stops replaying
+            try:
+                match_date = normalize_match_date(match[3])
+            except ValueError:
+                bad_dates.append(str(match[3]))
+        parsed.append((team1, team2, score1, score2, match_date))
+    if bad_scores:
+        print(f"Error: Bad scores (use 21-18): {', '.join(bad_scores)}. Nothing was logged.")
+    if bad_dates:
+        print(f"Error: Bad match dates (use MM-DD-YYYY): {', '.join(bad_dates)}. Nothing was logged.")
+    if bad_scores or bad_dates:
+        return 0
+
+    _settle_journal()
+    player_stats = get_player_stats()
 
-    changes1, changes2 = [], []
+    # Check every name up front so a typo in game 12 doesn't leave games 1-11 half-written
+    missing = sorted({
+        name for team1, team2, *_ in parsed for name in team1 + team2 if name not in player_stats
+    })
+    if missing:
+        print(f"Error: Players not found in player stats: {', '.join(missing)}. Nothing was logged.")
+        return 0
+
+    history_rows = []
+    player_history = []
+    for team1, team2, score1, score2, match_date in parsed:
+        changes1, changes2 = apply_match_result(player_stats, team1, team2, score1, score2, RATING_MODE)
+        match_id = new_match_id()
+        history_rows.append([match_date, ",".join(team1), ",".join(team2), f"{score1}-{score2}", match_id])
+        player_history += match_history_rows(
+            match_id, match_date, player_stats, team1, team2, changes1, changes2
+        )
+
+    # One sorted write for the stats (only changed rows are sent), then one append each
+    # for the match and player histories, sent at the same time. Nothing is appended
+    # unless the stats were saved, so the histories never get ahead of the ratings.
+    try:
+        _write_sorted_players(player_stats)
+    except Exception as e:
+        print(f"Failed to save player stats ({e}); nothing was logged.")
+        raise
+    _run_concurrently(
+        (storage.append_matches, history_rows),
+        (storage.append_history, player_history),
+    )
+    print(f"{len(history_rows)} match(es) logged and stats updated.")
+    return len(history_rows)
+
+# Rebuild every rating from Match History
+def rebuild_ratings(save=False):
+    """
+    Recompute every player's ELO, matches and streak by replaying Match History in date order.
+    Returns the rebuilt [name, elo, matches, streak] rows; they are only written if save=True.
+    """
+    _settle_journal()  # Journaled matches have to be in Match History to be replayed
+    player_names = [record["Player Name"] for record in _get_player_records()]
+    rows = replay_history(storage.load_matches(), player_names, RATING_MODE)
+    if save:
+        storage.save_players(rows)
+        _cache_player_rows(rows)
+        print(f"Ratings rebuilt from match history for {len(rows)} player(s).")
+    return rows
+
+# One player's rating over time
+def get_player_history(player_name):
+    """Return the player's [match id, date, player, pre, post, delta, streak] rows, oldest first."""
+    # Pending entries are read before storage, so a match that syncs in between is in one or the other
+    pending = [
+        row for entry in journal.pending_entries() for row in entry["history"] if row[2] == player_name
+    ] if journal is not None else []
+    rows = storage.load_player_history(player_name)
+    if pending:
+        # Matches still in the journal are newer than anything storage holds
+        stored = {row[0] for row in rows}
+        rows = rows + [row for row in pending if row[0] not in stored]
+    return rows
+
+# Bulk import and export (CSV, or Parquet with pyarrow installed)
+def import_players_file(path):
+    """Add or overwrite players from an ELO_Data-layout file. Returns (added, updated)."""
+    _settle_journal()  # Otherwise a pending sync could overwrite the imported stats
+    added, updated = elo_io.import_players(storage, path)
+    invalidate_player_cache()
+    print(f"{added} player(s) added and {updated} updated from {path}.")
+    return added, updated
+
+def import_matches_file(path):
+    """
+    Append matches from a Match History-layout file; rows whose match id is already
+    stored are skipped. Ratings are not touched - run rebuild_ratings(save=True) after.
+    """
+    _settle_journal()
+    count = elo_io.import_matches(storage, path)
+    print(f"{count} match(es) read from {path}; any already stored were skipped.")
+    return count
+
+def export_players_file(path):
+    _settle_journal()
+    count = elo_io.export_players(storage, path)
+    print(f"{count} player(s) exported to {path}.")
+    return count
+
+def export_matches_file(path):
+    _settle_journal()
+    count = elo_io.export_matches(storage, path)
+    print(f"{count} match(es) exported to {path}.")
+    return count
+
+def read_matches_file(path):
+    """
+    Read matches from a CSV file with columns team1, team2, score and an optional date.
+    Quote the team columns, e.g. "Ann, Bob","Cat, Dan",21-18. A header row is skipped.
+    """
+    matches = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or not "".join(row).strip():
+                continue
+            if len(row) < 3:
+                raise ValueError(f"Expected team1, team2, score in row: {row}")
+            if not row[2].strip()[:1].isdigit():
+                continue  # Header row
+            matches.append(tuple(cell.strip() for cell in row[:4]))
+    return matches
     
-    # Loop through players in team 1
-    for player in team1:  # Use player names from the team
-        baseline = get_baseline(player_stats, player)
-        #print("baseline1 is ")
-        #print(baseline)
-        streak_adjustment = 2 * player_stats[player]["streak"]
-        #print("Streak1 is ")
-        #print(streak_adjustment)
-        change = round((baseline*result1 + streak_adjustment + margin_adjustment*result1))# + elo_diff_adjustment) * (result1 - expected1))
-        changes1.append(change)
-
-    # Loop through players in team 2
-    for player in team2:  # Use player names from the team
-        baseline = get_baseline(player_stats, player)
-        #print("baseline2 is ")
-        #print(baseline)
-        streak_adjustment = 2 * player_stats[player]["streak"]
-        #print("Streak2 is ")
-        #print(streak_adjustment)
-        change = round((baseline*result2 + streak_adjustment + margin_adjustment*result2))# + elo_diff_adjustment) * (result2 - expected2))
-        changes2.append(change)
-
-    return changes1, changes2
-
 # Match input and processing
 def process_match():
     # Take input for the teams
@@ -282,6 +603,7 @@ def process_match():
     score1, score2 = map(int, score.split("-"))
 
     # Get the player stats (ELO, matches, streak)
+    _settle_journal()
     player_stats = get_player_stats()
 
     # Use the player names to get the ELO values
@@ -296,52 +618,31 @@ def process_match():
     print(f"Team 1 ELOs: {team1_elo}")
     print(f"Team 2 ELOs: {team2_elo}")
 
-    # Calculate the ELO changes based on the match result
-    changes1, changes2 = calculate_elo_change(team1_elo, team2_elo, score1, score2, player_stats, team1, team2)
+    # Calculate the ELO changes and update the player stats for both teams
+    changes1, changes2 = apply_match_result(player_stats, team1, team2, score1, score2, RATING_MODE)
 
     # Debug the changes
     print(f"ELO changes for Team 1: {changes1}")
     print(f"ELO changes for Team 2: {changes2}")
 
-    # Update player stats for team 1
-    for i, player in enumerate(team1):
-        player_stats[player]["elo"] += changes1[i]
-        player_stats[player]["matches"] += 1
-        if score1 > score2:
-            if player_stats[player]["streak"] >= 0:
-                player_stats[player]["streak"] += 1
-            else:
-                player_stats[player]["streak"] = 1
-        else:
-            if player_stats[player]["streak"] >= 0:
-                player_stats[player]["streak"] = -1
-            else:
-                player_stats[player]["streak"] -= 1
-        #player_stats[player]["streak"] += 1 if score1 > score2 else -player_stats[player]["streak"]
-
-    # Update player stats for team 2
-    for i, player in enumerate(team2):
-        player_stats[player]["elo"] += changes2[i]
-        player_stats[player]["matches"] += 1
-        if score2 > score1:
-            if player_stats[player]["streak"] >= 0:
-                player_stats[player]["streak"] += 1
-            else:
-                player_stats[player]["streak"] = 1
-        else:
-            if player_stats[player]["streak"] >= 0:
-                player_stats[player]["streak"] = -1
-            else:
-                player_stats[player]["streak"] -= 1
-        #player_stats[player]["streak"] += 1 if score2 > score1 else -player_stats[player]["streak"]
-
     #log_match(', '.join(team1), ', '.join(team2), f"{score1}-{score2}")
 
-    # Update Google Sheets with new stats
-    update_google_sheet(player_stats)
-
-    # After updating ELOs, sort the leaderboard by ELO
-    sort_leaderboard(player_stats)
+    # Sort the leaderboard by ELO and write it back (only rows whose contents
+    # changed, new stats or a new position, are sent), then the match and the
+    # players' history under one match id, so rebuild_ratings replays this match too.
+    # The histories only go in once the stats are saved, so they can't disagree.
+    match_id = new_match_id()
+    match_date = datetime.now().strftime("%m-%d-%Y")
+    match_row = [match_date, ",".join(team1), ",".join(team2), f"{score1}-{score2}", match_id]
+    player_history = match_history_rows(
+        match_id, match_date, player_stats, team1, team2, changes1, changes2
+    )
+    try:
+        _write_sorted_players(player_stats)
+    except Exception as e:
+        print(f"Failed to save player stats ({e}); the match was not processed.")
+        raise
+    _run_concurrently((storage.append_match, match_row), (storage.append_history, player_history))
     print("Match processed and stats updated.")
 
 # Create a match by inputing the players that are there
@@ -374,33 +675,10 @@ def create_match():
     # Step 3: Sort players by ELO (descending)
     player_elo.sort(key=lambda x: x[1], reverse=True)
 
-    num_players = len(player_elo)
-    half_size = num_players // 2
-
-    # Generate all possible combinations for Team 1
-    all_combinations = list(combinations(player_elo, half_size))
-    
-    best_team1, best_team2 = None, None
-    smallest_elo_diff = float('inf')
-    
-    for team1 in all_combinations:
-        # Create Team 2 as the complement of Team 1
-        team1_set = set(team1)
-        team2 = [player for player in player_elo if player not in team1_set]
-        
-        # Calculate ELO totals
-        team1_elo = sum(player[1] for player in team1)
-        team2_elo = sum(player[1] for player in team2)
-        
-        # Find the ELO difference
-        elo_diff = abs(team1_elo - team2_elo)
-        
-        # Update the best teams if this split is better
-        if elo_diff < smallest_elo_diff:
-            print(elo_diff)
-            smallest_elo_diff = elo_diff
-            best_team1, best_team2 = team1, team2
-            best_team1_elo, best_team2_elo = team1_elo, team2_elo
+    # Step 4: Find the split with the smallest ELO difference
+    best_team1, best_team2 = balance_teams(player_elo)
+    best_team1_elo = sum(player[1] for player in best_team1)
+    best_team2_elo = sum(player[1] for player in best_team2)
 
     # Extract player names for the final teams
     team1_names = [player[0] for player in best_team1]
@@ -408,12 +686,17 @@ def create_match():
 
     print(f"Team 1: {team1_names}, Total ELO: {best_team1_elo}")
     print(f"Team 2: {team2_names}, Total ELO: {best_team2_elo}")
+    if best_team1 and best_team2:
+        team1_win = win_probability([p[1] for p in best_team1], [p[1] for p in best_team2])
+        print(f"Team 1 win probability: {team1_win:.0%}")
 
     return team1_names, team2_names
 
-def create_match_button(player_list):
+def create_match_button(player_list, player_stats=None):
+    """Split player_list into the two most balanced teams; pass player_stats to skip the stats read."""
 
-    player_stats = get_player_stats()
+    if player_stats is None:
+        player_stats = get_player_stats()
 
     # Step 2: Retrieve player ELOs
     player_elo = []
@@ -427,33 +710,10 @@ def create_match_button(player_list):
     # Step 3: Sort players by ELO (descending)
     player_elo.sort(key=lambda x: x[1], reverse=True)
 
-    num_players = len(player_elo)
-    half_size = num_players // 2
-
-    # Generate all possible combinations for Team 1
-    all_combinations = list(combinations(player_elo, half_size))
-    
-    best_team1, best_team2 = None, None
-    smallest_elo_diff = float('inf')
-    
-    for team1 in all_combinations:
-        # Create Team 2 as the complement of Team 1
-        team1_set = set(team1)
-        team2 = [player for player in player_elo if player not in team1_set]
-        
-        # Calculate ELO totals
-        team1_elo = sum(player[1] for player in team1)
-        team2_elo = sum(player[1] for player in team2)
-        
-        # Find the ELO difference
-        elo_diff = abs(team1_elo - team2_elo)
-        
-        # Update the best teams if this split is better
-        if elo_diff < smallest_elo_diff:
-            print(elo_diff)
-            smallest_elo_diff = elo_diff
-            best_team1, best_team2 = team1, team2
-            best_team1_elo, best_team2_elo = team1_elo, team2_elo
+    # Step 4: Find the split with the smallest ELO difference
+    best_team1, best_team2 = balance_teams(player_elo)
+    best_team1_elo = sum(player[1] for player in best_team1)
+    best_team2_elo = sum(player[1] for player in best_team2)
 
     # Extract player names for the final teams
     team1_names = [player[0] for player in best_team1]
@@ -461,8 +721,59 @@ def create_match_button(player_list):
 
     print(f"Team 1: {team1_names}, Total ELO: {best_team1_elo}")
     print(f"Team 2: {team2_names}, Total ELO: {best_team2_elo}")
+    if best_team1 and best_team2:
+        team1_win = win_probability([p[1] for p in best_team1], [p[1] for p in best_team2])
+        print(f"Team 1 win probability: {team1_win:.0%}")
 
     return team1_names, team2_names
+
+# Several candidate splits, with constraints
+def suggest_teams(player_list, k=5, apart=(), together=(), spread=(), avoid=()):
+    """
+    Return up to k balanced splits of player_list as Split(team1, team2, diff, win_prob) tuples.
+
+    Args:
+        apart (list): Pairs of names that must be on opposite teams.
+        together (list): Pairs of names that must be on the same team.
+        spread (list): Groups (e.g. setters) to divide evenly between the teams.
+        avoid (list): (team1, team2) splits not to repeat, such as last game's teams.
+    """
+    player_stats = get_player_stats()
+    player_elo = []
+    for name in player_list:
+        if name in player_stats:
+            player_elo.append((name, player_stats[name]['elo']))
+        else:
+            print(f"Warning: Player '{name}' not found. Assigning default ELO of {DEFAULT_ELO}.")
+            player_elo.append((name, DEFAULT_ELO))
+
+    return best_splits(player_elo, k=k, apart=apart, together=together, spread=spread, avoid=avoid)
+
+# Teams for several courts at once
+def create_courts(player_list, courts, rounds=1, team_size=None):
+    """
+    Balance several simultaneous games and rotate sit-outs across rounds.
+
+    Returns:
+        list: One (courts, sitting_out) pair per round; each court is Court(team1, team2, diff).
+    """
+    player_stats = get_player_stats()
+    player_elo = []
+    for name in player_list:
+        if name in player_stats:
+            player_elo.append((name, player_stats[name]['elo']))
+        else:
+            print(f"Warning: Player '{name}' not found. Assigning default ELO of {DEFAULT_ELO}.")
+            player_elo.append((name, DEFAULT_ELO))
+
+    plan = plan_session(player_elo, courts, rounds, team_size)
+    for round_number, (round_courts, sitting_out) in enumerate(plan, start=1):
+        print(f"Round {round_number}:")
+        for court_number, court in enumerate(round_courts, start=1):
+            print(f"  Court {court_number}: {court.team1} vs {court.team2} (ELO gap {court.diff})")
+        if sitting_out:
+            print(f"  Sitting out: {sitting_out}")
+    return plan
     
 
 if __name__ == "__main__":
@@ -470,6 +781,27 @@ if __name__ == "__main__":
     # Has to happen
     #splayer_stats = get_player_stats()  # Fetch player stats from Google Sheets
 
+    # Batch mode: python elo_project.py batch matches.csv
+    if len(sys.argv) == 3 and sys.argv[1] == "batch":
+        # Non-zero exit when nothing was logged, so scripts can tell
+        sys.exit(0 if log_matches(read_matches_file(sys.argv[2])) else 1)
+
+    # Replay mode: python elo_project.py replay [--save]
+    if len(sys.argv) >= 2 and sys.argv[1] == "replay":
+        for name, elo, matches, streak in rebuild_ratings(save="--save" in sys.argv[2:]):
+            print(f"{name}: {elo} ({matches} matches, streak {streak})")
+        sys.exit(0)
+
+    # Import/export mode: python elo_project.py import|export players|matches FILE
+    if len(sys.argv) == 4 and sys.argv[1] in ("import", "export") and sys.argv[2] in ("players", "matches"):
+        {
+            ("import", "players"): import_players_file,
+            ("import", "matches"): import_matches_file,
+            ("export", "players"): export_players_file,
+            ("export", "matches"): export_matches_file,
+        }[sys.argv[1], sys.argv[2]](sys.argv[3])
+        sys.exit(0)
+
     # Header
     print("")
     print("========================================================")
@@ -480,6 +812,14 @@ if __name__ == "__main__":
     print("Commands (for now):")
     print("     1.) process_match() --> Log the scores and teams")
     print("     2.) create_match(player_stats) --> Create teams based upon ELO data")
+    print("     3.) log_matches([(team1, team2, score), ...]) --> Log a whole session at once")
+    print("         (or from the shell: python elo_project.py batch matches.csv)")
+    print("     4.) rebuild_ratings(save=True) --> Recompute all ratings from Match History")
+    print("         (or from the shell: python elo_project.py replay --save)")
+    print("     5.) print_sheets_stats() --> Sheets API calls so far, by function")
+    print("         (set ELO_SHEETS_STATS=1 to print them when the session exits)")
+    print("     6.) import_players_file(path) / export_matches_file(path) --> Bulk CSV or Parquet")
+    print("         (or from the shell: python elo_project.py import|export players|matches FILE)")
     print("========================================================")
     print("Steps to setup the bot for the night:")
     print("     1.) python")
@@ -0,0 +1,184 @@
+#
+#
+# RATING RULES FOR elo_project
+#
+# Kept free of Streamlit and Sheets imports so replays and simulations can run offline.
+
+import numpy as np
+
+# Constants
+DEFAULT_ELO = 1000
+K_FACTOR = 32
+
+# Rating modes: "baseline" is the live rule (baseline ladder, streak and margin bonus,
+# team strength ignored); "expected" is classic Elo, K_FACTOR * (actual - expected)
+# with the expected score from the teams' average ELO
+RATING_MODES = ("baseline", "expected")
+
+# Chance Team 1 wins, from the teams' average ELO
+def win_probability(team1_elo, team2_elo):
+    """Expected score for Team 1 (0 to 1); 400 points of average ELO is 10:1 odds."""
+    team1_avg_elo = sum(team1_elo) / len(team1_elo)
+    team2_avg_elo = sum(team2_elo) / len(team2_elo)
+    return 1 / (1 + 10 ** ((team2_avg_elo - team1_avg_elo) / 400))
+
+def win_probability_batch(elos, team):
+    """
+    NumPy version of win_probability for many candidate splits at once.
+
+    Args:
+        elos (array): Player ratings, shape (players,) or (..., players).
+        team (array): 1 for Team 1, 2 for Team 2, 0 for not playing, shape (..., players)
+            so one row per split.
+
+    Returns:
+        array: Team 1's win probability per split, shape (...); NaN where a team is empty.
+    """
+    elos = np.asarray(elos, dtype=float)
+    team = np.asarray(team)
+    in1 = team == 1
+    in2 = team == 2
+    count1 = in1.sum(axis=-1)
+    count2 = in2.sum(axis=-1)
+    # An empty team has no average; the 0/0 below gives NaN for it, without the warning
+    with np.errstate(invalid="ignore", divide="ignore"):
+        team1_avg_elo = np.where(in1, elos, 0).sum(axis=-1) / count1
+        team2_avg_elo = np.where(in2, elos, 0).sum(axis=-1) / count2
+    return 1 / (1 + 10 ** ((team2_avg_elo - team1_avg_elo) / 400))
+
+# Calculate the baseline ELO for each player based on their match history
+def get_baseline(player_stats, player):
+    """Calculate the baseline ELO for each player based on their match history."""
+    if player not in player_stats:
+        print(f"Player {player} not found in player stats!")
+        return 40  # Default baseline ELO if player is not found
+
+    matches = player_stats[player]["matches"]
+    #print(matches)
+    return baseline_for_matches(matches)
+
+def baseline_for_matches(matches):
+    """Baseline ELO change for a player who has played this many matches."""
+    if matches < 2:
+        return 40
+    elif matches < 4:
+        return 35
+    elif matches < 6:
+        return 30
+    elif matches < 8:
+        return 25
+    elif matches < 10:
+        return 20
+    else:
+        return 15
+
+# Same ladder as a lookup table, for the replay loop: index by min(matches, BASELINE_CAP)
+BASELINE_CAP = 10
+BASELINE_BY_MATCHES = tuple(baseline_for_matches(m) for m in range(BASELINE_CAP + 1))
+_BASELINE_ARRAY = np.array(BASELINE_BY_MATCHES)
+
+# Calculate the ELO changes after the matches
+def calculate_elo_change(team1_elo, team2_elo, score1, score2, player_stats, team1, team2, mode="baseline"):
+    if mode == "expected":
+        return expected_elo_change(team1_elo, team2_elo, score1, score2)
+    if mode != "baseline":
+        raise ValueError(f"Unknown rating mode {mode!r}; expected one of {RATING_MODES}")
+
+    margin = abs(score1 - score2)
+
+    result1 = 1 if score1 > score2 else -1
+    result2 = 1 if score2 > score1 else -1
+
+    margin_adjustment = min(5, margin // 3) if margin >= 3 else 0
+
+    changes1, changes2 = [], []
+    
+    # Loop through players in team 1
+    for player in team1:  # Use player names from the team
+        baseline = get_baseline(player_stats, player)
+        #print("baseline1 is ")
+        #print(baseline)
+        streak_adjustment = 2 * player_stats[player]["streak"]
+        #print("Streak1 is ")
+        #print(streak_adjustment)
+        change = round((baseline*result1 + streak_adjustment + margin_adjustment*result1))
+        changes1.append(change)
+
+    # Loop through players in team 2
+    for player in team2:  # Use player names from the team
+        baseline = get_baseline(player_stats, player)
+        #print("baseline2 is ")
+        #print(baseline)
+        streak_adjustment = 2 * player_stats[player]["streak"]
+        #print("Streak2 is ")
+        #print(streak_adjustment)
+        change = round((baseline*result2 + streak_adjustment + margin_adjustment*result2))
+        changes2.append(change)
+
+    return changes1, changes2
+
+def expected_elo_change(team1_elo, team2_elo, score1, score2):
+    """Classic Elo: every player on a team moves by K_FACTOR * (actual - expected), rounded."""
+    expected1 = win_probability(team1_elo, team2_elo)
+    expected2 = 1 - expected1
+    actual1 = 1 if score1 > score2 else 0.5 if score1 == score2 else 0
+    actual2 = 1 - actual1
+    change1 = round(K_FACTOR * (actual1 - expected1))
+    change2 = round(K_FACTOR * (actual2 - expected2))
+    return [change1] * len(team1_elo), [change2] * len(team2_elo)
+
+# Apply one match result to the in-memory stats
+def apply_match_result(player_stats, team1, team2, score1, score2, mode="baseline"):
+    """Update elo, matches and streak for both teams in player_stats. Returns the ELO changes."""
+    team1_elo = [player_stats[p]["elo"] for p in team1]
+    team2_elo = [player_stats[p]["elo"] for p in team2]
+    changes1, changes2 = calculate_elo_change(team1_elo, team2_elo, score1, score2, player_stats, team1, team2, mode)
+
+    for team, changes, won in ((team1, changes1, score1 > score2), (team2, changes2, score2 > score1)):
+        for i, player in enumerate(team):
+            player_stats[player]["elo"] += changes[i]
+            player_stats[player]["matches"] += 1
+            # A win extends a winning streak or starts a new one; a loss does the same for losing
+            if won:
+                if player_stats[player]["streak"] >= 0:
+                    player_stats[player]["streak"] += 1
+                else:
+                    player_stats[player]["streak"] = 1
+            else:
+                if player_stats[player]["streak"] >= 0:
+                    player_stats[player]["streak"] = -1
+                else:
+                    player_stats[player]["streak"] -= 1
+
+    return changes1, changes2
+
+# Vectorized ELO changes for many players / matches / outcomes at once
+def calculate_elo_change_batch(matches, streaks, team, score1, score2):
+    """
+    NumPy version of calculate_elo_change, giving the same numbers without a Python loop.
+
+    Args:
+        matches (array): Matches played before the game, shape (..., players).
+        streaks (array): Streak before the game, same shape.
+        team (array): 1 for Team 1, 2 for Team 2, 0 for padding / not playing, same shape.
+        score1, score2 (array): Scores, shape (...) so one per match or hypothetical outcome.
+
+    Returns:
+        array: ELO change per player, same shape as team (0 where team is 0).
+    """
+    matches = np.asarray(matches)
+    streaks = np.asarray(streaks)
+    team = np.asarray(team)
+    score1 = np.asarray(score1)[..., np.newaxis]
+    score2 = np.asarray(score2)[..., np.newaxis]
+
+    margin = np.abs(score1 - score2)
+    margin_adjustment = np.where(margin >= 3, np.minimum(5, margin // 3), 0)
+
+    # +1 for players on the team that won, -1 otherwise (a draw counts as a loss for both)
+    won = np.where(team == 1, score1 > score2, score2 > score1)
+    result = np.where(won, 1, -1)
+
+    baseline = _BASELINE_ARRAY[np.minimum(matches, BASELINE_CAP)]
+    changes = baseline * result + 2 * streaks + margin_adjustment * result
+    return np.where(team == 0, 0, changes)
@@ -0,0 +1,107 @@
+#
+#
+# RATING REPLAY FOR elo_project
+#
+# Rebuilds every player's ELO, match count and streak from the Match History rows,
+# using the same rules as apply_match_result.
+
+from datetime import datetime
+
+from elo_players import PlayerTable
+from elo_rating import DEFAULT_ELO, BASELINE_BY_MATCHES, BASELINE_CAP, RATING_MODES, expected_elo_change
+
+
+MATCH_DATE_FORMAT = "%m-%d-%Y"  # How Match History stores dates
+# Also accepted from users and files, and stored as MATCH_DATE_FORMAT
+INPUT_DATE_FORMATS = (MATCH_DATE_FORMAT, "%Y-%m-%d", "%m/%d/%Y")
+
+
+def normalize_match_date(value):
+    """Return a date in any of INPUT_DATE_FORMATS as MM-DD-YYYY; raises ValueError if it isn't one."""
+    for date_format in INPUT_DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), date_format).strftime(MATCH_DATE_FORMAT)
+        except ValueError:
+            pass
+    raise ValueError(f"Bad match date {value!r}; use MM-DD-YYYY")
+
+
+def sort_history(match_rows):
+    """Return [date, team1, team2, score] rows in date order; same-day games keep their logged order."""
+    parsed_dates = {}
+    for row in match_rows:
+        if row[0] not in parsed_dates:
+            try:
+                parsed_dates[row[0]] = datetime.strptime(row[0].strip(), MATCH_DATE_FORMAT)
+            except ValueError:
+                raise ValueError(f"Bad match date {row[0]!r} in history row {row}") from None
+    return sorted(match_rows, key=lambda row: parsed_dates[row[0]])
+
+
+def replay_history(match_rows, player_names=(), mode="baseline"):
+    """
+    Replay match history from scratch: every player starts at DEFAULT_ELO with no matches.
+
+    Args:
+        match_rows (list): [date, team1, team2, score] rows as stored in Match History.
+        player_names (iterable): Players to include even if they have never played.
+        mode (str): Rating mode, one of RATING_MODES, as in calculate_elo_change.
+
+    Returns:
+        list: [name, elo, matches, streak] rows sorted by ELO, highest first.
+    """
+    if mode not in RATING_MODES:
+        raise ValueError(f"Unknown rating mode {mode!r}; expected one of {RATING_MODES}")
+
+    # Names are interned to ids and stats kept in flat arrays instead of a dict per player
+    table = PlayerTable()
+    ids = table.ids
+    elo, matches, streak = table.elo, table.matches, table.streak
+
+    def player_id(name):
+        return table.intern(name, DEFAULT_ELO)
+
+    for name in player_names:
+        if name:
+            player_id(name)
+
+    baselines = BASELINE_BY_MATCHES
+    cap = BASELINE_CAP
+    for row in sort_history(match_rows):
+        team1 = [ids[name] if name in ids else player_id(name) for name in map(str.strip, row[1].split(","))]
+        team2 = [ids[name] if name in ids else player_id(name) for name in map(str.strip, row[2].split(","))]
+        score1, score2 = map(int, row[3].split("-"))
+
+        # Same arithmetic as calculate_elo_change; both teams' changes come from
+        # the pre-match stats before any of them are applied
+        result1 = 1 if score1 > score2 else -1
+        result2 = 1 if score2 > score1 else -1
+        if mode == "expected":
+            changes1, changes2 = expected_elo_change(
+                [elo[p] for p in team1], [elo[p] for p in team2], score1, score2
+            )
+        else:
+            margin = abs(score1 - score2)
+            margin_adjustment = min(5, margin // 3) if margin >= 3 else 0
+            changes1 = [
+                baselines[matches[p] if matches[p] < cap else cap] * result1 + 2 * streak[p] + margin_adjustment * result1
+                for p in team1
+            ]
+            changes2 = [
+                baselines[matches[p] if matches[p] < cap else cap] * result2 + 2 * streak[p] + margin_adjustment * result2
+                for p in team2
+            ]
+
+        for team, changes, won in ((team1, changes1, result1 > 0), (team2, changes2, result2 > 0)):
+            for pid, change in zip(team, changes):
+                elo[pid] += change
+                matches[pid] += 1
+                current = streak[pid]
+                if won:
+                    streak[pid] = current + 1 if current >= 0 else 1
+                else:
+                    streak[pid] = -1 if current >= 0 else current - 1
+
+    rows = table.rows()
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows
@@ -0,0 +1,148 @@
+#
+#
+# SHEETS REQUEST SCHEDULER FOR elo_project
+#
+# Sits in front of every worksheet so parallel Streamlit sessions share the quota:
+#   - identical reads already in flight are coalesced into one request
+#   - token buckets keep reads and writes under the per-minute quota
+#   - quota (429) and server errors are retried with exponential backoff
+
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from elo_metrics import READ_OPERATIONS, WRITE_OPERATIONS
+
+# Sheets allows 60 read and 60 write requests per minute per user
+READS_PER_MINUTE = 60
+WRITES_PER_MINUTE = 60
+BURST = 10  # Requests allowed back to back before the rate limit kicks in
+
+MAX_RETRIES = 5
+BASE_DELAY = 1.0  # Seconds; doubles on each retry
+MAX_DELAY = 32.0
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Appends aren't idempotent: a 5xx may come back after the row was written,
+# so only retry them when the request was definitely rejected
+NON_IDEMPOTENT_OPERATIONS = {"append_row", "append_rows"}
+
+
+def _status(error):
+    """HTTP status of a gspread APIError (or anything carrying a requests response)."""
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait, if it said."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Blocking token bucket: acquire() waits until a request is allowed."""
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RequestScheduler:
+    """Coalesces, rate-limits and retries Sheets API calls for the whole process."""
+
+    def __init__(self, reads_per_minute=READS_PER_MINUTE, writes_per_minute=WRITES_PER_MINUTE,
+                 burst=BURST, max_retries=MAX_RETRIES, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.read_bucket = TokenBucket(reads_per_minute, burst)
+        self.write_bucket = TokenBucket(writes_per_minute, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.in_flight = {}  # Read key -> Future shared by everyone asking for it
+
+    def call(self, operation, fn, *args, key=None, **kwargs):
+        """Run fn(*args, **kwargs) as one Sheets request; reads with the same key share one request."""
+        if operation not in READ_OPERATIONS or key is None:
+            return self._run(operation, fn, args, kwargs)
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self.in_flight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._run(operation, fn, args, kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    def _run(self, operation, fn, args, kwargs):
+        bucket = self.read_bucket if operation in READ_OPERATIONS else self.write_bucket
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as error:
+                status = _status(error)
+                retryable = status in RETRYABLE_STATUS and (
+                    operation not in NON_IDEMPOTENT_OPERATIONS or status == 429
+                )
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = _retry_after(error)
+                if delay is None:
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"Sheets {operation} failed with HTTP {status}; retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1} of {self.max_retries}).")
+                time.sleep(delay)
+
+
+# Shared by every worksheet in the process
+sheets_scheduler = RequestScheduler()
+
+
+class ScheduledWorksheet:
+    """Wraps a worksheet so its API calls go through a RequestScheduler."""
+
+    def __init__(self, worksheet, scheduler=sheets_scheduler):
+        self.worksheet = worksheet
+        self.scheduler = scheduler
+
+    def __getattr__(self, name):
+        attribute = getattr(self.worksheet, name)
+        if name not in READ_OPERATIONS and name not in WRITE_OPERATIONS:
+            return attribute
+
+        def call(*args, **kwargs):
+            key = (id(self.worksheet), name, repr(args), repr(sorted(kwargs.items())))
+            return self.scheduler.call(name, attribute, *args, key=key, **kwargs)
+
+        return call
@@ -0,0 +1,277 @@
+#
+#
+# RATING SYSTEM SIMULATOR FOR elo_project
+#
+# Plays synthetic games between players with a hidden true skill, runs the rating
+# rules over them and measures how quickly and how well each set of constants
+# recovers the true ranking. Every parameter set sees the same schedule and the
+# same results, so differences come from the rules alone.
+#   python elo_sim.py                  default sweep (180 parameter sets, 100k matches)
+#   python elo_sim.py --quick          smaller sweep
+#   python elo_sim.py --workers 4      split the sweep across processes
+
+import argparse
+import itertools
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from elo_rating import BASELINE_BY_MATCHES, BASELINE_CAP, DEFAULT_ELO, K_FACTOR
+
+# The rule constants being tuned. DEFAULT_PARAMS are the "baseline" mode of calculate_elo_change:
+# the baseline ladder as is, 2 x streak, a margin bonus capped at 5 and no expected-score
+# term. k_factor > 0 adds k * (actual - expected) on top, with expected from the teams'
+# average ELO as in win_probability (the "expected" mode is that term alone).
+SimParams = namedtuple("SimParams", ["baseline_scale", "streak_weight", "margin_cap", "k_factor"])
+DEFAULT_PARAMS = SimParams(1.0, 2, 5, 0)
+
+SimResult = namedtuple("SimResult", ["params", "accuracy", "converged_at", "inflation"])
+
+TEAM_SIZE = 6
+SKILL_SD = 200  # Spread of true skill, in ELO points
+TARGET_ACCURACY = 0.9  # Rank correlation that counts as converged
+CHECKPOINTS = 40
+
+
+def make_schedule(num_players, num_matches, team_size, rng):
+    """Random games: row m holds Team 1's ids then Team 2's, shape (num_matches, 2 * team_size)."""
+    schedule = np.empty((num_matches, 2 * team_size), dtype=np.int64)
+    chunk = max(1, 2 ** 22 // num_players)  # Keep the random block around 32 MB
+    for start in range(0, num_matches, chunk):
+        stop = min(num_matches, start + chunk)
+        keys = rng.random((stop - start, num_players))
+        schedule[start:stop] = np.argpartition(keys, 2 * team_size - 1, axis=1)[:, :2 * team_size]
+    return schedule
+
+
+def play_games(skill, schedule, team_size, rng):
+    """
+    Scores for every scheduled game. The winner is drawn from the Elo expectation on
+    the teams' average true skill and gets 21; closer games leave the loser more points.
+
+    Returns:
+        tuple: (score1, score2) int arrays, one entry per game.
+    """
+    team_skill = skill[schedule]
+    gap = team_skill[:, :team_size].mean(axis=1) - team_skill[:, team_size:].mean(axis=1)
+    p1 = 1 / (1 + 10 ** (-gap / 400))
+    team1_won = rng.random(len(schedule)) < p1
+    p_loser = np.where(team1_won, 1 - p1, p1)
+    loser_score = rng.binomial(19, 0.05 + 1.7 * np.minimum(p_loser, 0.5))
+    score1 = np.where(team1_won, 21, loser_score)
+    score2 = np.where(team1_won, loser_score, 21)
+    return score1, score2
+
+
+def pre_match_state(num_players, schedule, result):
+    """
+    Matches played and streak of every player going into each game. Neither depends on
+    the rating constants, so they're worked out once for the whole sweep.
+
+    Returns:
+        tuple: (played, streak) arrays shaped like schedule.
+    """
+    matches = np.zeros(num_players, dtype=np.int64)
+    streak = np.zeros(num_players, dtype=np.int64)
+    played = np.empty_like(schedule)
+    streak_before = np.empty_like(schedule)
+    for m, idx in enumerate(schedule):
+        before = streak[idx]
+        played[m] = matches[idx]
+        streak_before[m] = before
+        matches[idx] += 1
+        # Same streak rules as apply_match_result
+        streak[idx] = np.where(
+            result[m] > 0, np.where(before >= 0, before + 1, 1), np.where(before >= 0, -1, before - 1)
+        )
+    return played, streak_before
+
+
+def rank_accuracy(ratings, skill):
+    """Spearman rank correlation between each row of ratings and the true skill."""
+    rating_ranks = ratings.argsort(axis=-1, kind="stable").argsort(axis=-1).astype(float)
+    skill_ranks = skill.argsort().argsort().astype(float)
+    rating_ranks -= rating_ranks.mean(axis=-1, keepdims=True)
+    skill_ranks -= skill_ranks.mean()
+    return (rating_ranks @ skill_ranks) / (
+        np.sqrt((rating_ranks ** 2).sum(axis=-1)) * np.sqrt((skill_ranks ** 2).sum())
+    )
+
+
+def simulate(params, num_players=200, num_matches=100_000, team_size=TEAM_SIZE,
+             skill_sd=SKILL_SD, checkpoints=CHECKPOINTS, target=TARGET_ACCURACY, seed=0):
+    """
+    Run every parameter set over the same simulated league.
+
+    Args:
+        params (list): SimParams to compare.
+        num_matches (int): Games played in total; accuracy is measured up to `checkpoints` times along the way.
+        target (float): Rank correlation at which a parameter set counts as converged.
+        seed (int): Same seed, same players, schedule and results.
+
+    Returns:
+        list: One SimResult per parameter set, in the order given. accuracy holds the rank
+            correlation at each checkpoint, converged_at the average games per player when
+            it first reached target (None if it never did) and inflation the mean rating
+            minus DEFAULT_ELO at the end.
+    """
+    params = [SimParams(*p) for p in params]
+    rng = np.random.default_rng(seed)
+    skill = rng.normal(DEFAULT_ELO, skill_sd, num_players)
+    schedule = make_schedule(num_players, num_matches, team_size, rng)
+    score1, score2 = play_games(skill, schedule, team_size, rng)
+
+    # +1 / -1 per player and game, as in calculate_elo_change
+    sides = np.repeat([[True] * team_size + [False] * team_size], num_matches, axis=0)
+    result = np.where(sides, np.where(score1 > score2, 1, -1)[:, None], np.where(score2 > score1, 1, -1)[:, None])
+    margin_steps = (np.abs(score1 - score2) // 3)[:, None]
+    played, streak = pre_match_state(num_players, schedule, result)
+    baseline_index = np.minimum(played, BASELINE_CAP)
+
+    ladder = np.array(BASELINE_BY_MATCHES, dtype=float)
+    baselines = np.rint(np.outer([p.baseline_scale for p in params], ladder)).astype(np.int64)
+    # Checkpoints spaced geometrically from about one game per player to the end, so
+    # convergence in the first few games is resolved as well as the long run
+    first = max(1, min(num_matches, num_players // (2 * team_size)))
+    bounds = np.unique(np.geomspace(first, num_matches, checkpoints).round().astype(int))
+    ratings = np.full((len(params), len(bounds), num_players), DEFAULT_ELO, dtype=np.int64)
+
+    # Without the expected-score term a game's changes don't depend on anyone's rating,
+    # so each parameter set's ratings are just sums of per-game changes
+    fixed = [i for i, p in enumerate(params) if not p.k_factor]
+    for i in fixed:
+        p = params[i]
+        changes = (baselines[i][baseline_index] * result + p.streak_weight * streak
+                   + np.minimum(p.margin_cap, margin_steps) * result)
+        elo = np.full(num_players, DEFAULT_ELO, dtype=np.int64)
+        start = 0
+        for c, stop in enumerate(bounds):
+            elo += np.bincount(
+                schedule[start:stop].ravel(), weights=changes[start:stop].ravel(), minlength=num_players
+            ).astype(np.int64)
+            ratings[i, c] = elo
+            start = stop
+
+    # With it, games have to be played in order, but all those parameter sets move together
+    rated = [i for i, p in enumerate(params) if p.k_factor]
+    if rated:
+        ratings[rated] = _simulate_expected(
+            [params[i] for i in rated], baselines[rated], schedule, result, margin_steps,
+            baseline_index, streak, score1, score2, team_size, num_players, bounds,
+        )
+
+    accuracy = rank_accuracy(ratings, skill)  # (params, checkpoints)
+    games_per_player = bounds * 2 * team_size / num_players
+    results = []
+    for i, p in enumerate(params):
+        reached = np.nonzero(accuracy[i] >= target)[0]
+        results.append(SimResult(
+            p,
+            tuple(float(a) for a in accuracy[i]),
+            float(games_per_player[reached[0]]) if len(reached) else None,
+            float(ratings[i, -1].mean() - DEFAULT_ELO),
+        ))
+    return results
+
+
+def _simulate_expected(params, baselines, schedule, result, margin_steps, baseline_index,
+                       streak, score1, score2, team_size, num_players, bounds):
+    """Game-by-game ratings for parameter sets with an expected-score term, one row per set."""
+    streak_weight = np.array([p.streak_weight for p in params])[:, None]
+    margin_cap = np.array([p.margin_cap for p in params])[:, None]
+    k_factor = np.array([p.k_factor for p in params], dtype=float)
+    actual1 = (score1 > score2).astype(float)
+    actual2 = (score2 > score1).astype(float)
+
+    elo = np.full((len(params), num_players), DEFAULT_ELO, dtype=np.int64)
+    ratings = np.empty((len(params), len(bounds), num_players), dtype=np.int64)
+    c = 0
+    for m, idx in enumerate(schedule):
+        current = elo[:, idx]
+        gap = current[:, team_size:].mean(axis=1) - current[:, :team_size].mean(axis=1)
+        expected1 = 1 / (1 + 10 ** (gap / 400))
+        adjust1 = k_factor * (actual1[m] - expected1)
+        adjust2 = k_factor * (actual2[m] - (1 - expected1))
+        change = (baselines[:, baseline_index[m]] * result[m] + streak_weight * streak[m]
+                  + np.minimum(margin_cap, margin_steps[m]) * result[m])
+        change = change + np.repeat(np.stack([adjust1, adjust2], axis=1), team_size, axis=1)
+        elo[:, idx] = current + np.rint(change).astype(np.int64)
+        while c < len(bounds) and m + 1 == bounds[c]:
+            ratings[:, c] = elo
+            c += 1
+    return ratings
+
+
+def _chunks(items, count):
+    size = -(-len(items) // count)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def sweep(params, workers=None, **options):
+    """
+    simulate() over many parameter sets, split across worker processes.
+    Every worker rebuilds the same league from the seed, so results match a single-process run.
+    """
+    params = list(params)
+    workers = min(workers or os.cpu_count() or 1, len(params))
+    if workers <= 1:
+        return simulate(params, **options)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(simulate, chunk, **options) for chunk in _chunks(params, workers)]
+        return [result for future in futures for result in future.result()]
+
+
+def default_grid(quick=False):
+    """The parameter sets swept from the command line; always includes DEFAULT_PARAMS."""
+    if quick:
+        grid = itertools.product((0.5, 1.0, 1.5), (0, 2), (0, 5), (0, K_FACTOR))
+    else:
+        grid = itertools.product((0.5, 0.75, 1.0, 1.25, 1.5), (0, 1, 2, 3), (0, 2, 5), (0, K_FACTOR // 2, K_FACTOR))
+    return [SimParams(*p) for p in grid]
+
+
+def format_results(results, top=15):
+    """Table of the best parameter sets by final rank accuracy, plus the live rules."""
+    ranked = sorted(results, key=lambda r: -r.accuracy[-1])
+    shown = ranked[:top]
+    shown += [r for r in results if r.params == DEFAULT_PARAMS and r not in shown]
+    lines = [f"{'baseline x':>10} {'streak':>6} {'margin':>6} {'K':>4}  {'accuracy':>8}  {'converged':>9}  {'inflation':>9}"]
+    for r in shown:
+        p = r.params
+        converged = f"{r.converged_at:.1f}" if r.converged_at is not None else "never"
+        marker = "  <- current rules" if p == DEFAULT_PARAMS else ""
+        lines.append(
+            f"{p.baseline_scale:>10} {p.streak_weight:>6} {p.margin_cap:>6} {p.k_factor:>4}  "
+            f"{r.accuracy[-1]:>8.3f}  {converged:>9}  {r.inflation:>+9.1f}{marker}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep rating constants over simulated leagues.")
+    parser.add_argument("--quick", action="store_true", help="Smaller grid and league")
+    parser.add_argument("--players", type=int, default=None, help="Players in the league (default 200)")
+    parser.add_argument("--matches", type=int, default=None, help="Games to simulate (default 100000)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes to use (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    params = default_grid(args.quick)
+    num_players = args.players or (100 if args.quick else 200)
+    num_matches = args.matches or (20_000 if args.quick else 100_000)
+
+    started = time.perf_counter()
+    results = sweep(params, args.workers, num_players=num_players, num_matches=num_matches, seed=args.seed)
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(params)} parameter sets, {num_players} players, {num_matches} matches ({elapsed:.1f}s)")
+    print(f"accuracy: rank correlation with true skill at the end; "
+          f"converged: games per player to reach {TARGET_ACCURACY}")
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+#
+#
+# STORAGE BACKENDS FOR elo_project
+#
+# Player rows are always [name, elo, matches, streak], match rows are
+# [date, team1, team2, score, match id] and history rows are [match id, date,
+# player, pre, post, delta, streak], the same layout as the ELO_Data, Match
+# History and Player History tabs. Matches logged before ids existed have no
+# fifth column (or an empty one).
+
+import sqlite3
+import threading
+
+from elo_history import HistoryIndex
+
+
+class StorageBackend:
+    """Interface shared by every storage engine."""
+
+    def load_players(self):
+        """Return every player row, in stored order."""
+        raise NotImplementedError
+
+    def save_players(self, rows):
+        """Write the whole player table, in the given order."""
+        raise NotImplementedError
+
+    def add_players(self, rows):
+        """Append new player rows, in one request where the engine allows it."""
+        raise NotImplementedError
+
+    def update_players(self, rows):
+        """Overwrite existing players' rows in place, matched by name. Raises KeyError, writing nothing, if one is missing."""
+        raise NotImplementedError
+
+    def set_rating(self, player_name, elo):
+        """Change a single player's ELO."""
+        raise NotImplementedError
+
+    def append_match(self, row):
+        """Append one row to the match history; a row whose match id is already stored is skipped."""
+        raise NotImplementedError
+
+    def append_matches(self, rows):
+        """Append several rows to the match history, skipping match ids already stored."""
+        for row in rows:
+            self.append_match(row)
+
+    def load_matches(self):
+        """Return every match history row, oldest first."""
+        raise NotImplementedError
+
+    def iter_matches(self, chunk_size):
+        """Yield the match history in lists of up to chunk_size rows, oldest first."""
+        rows = self.load_matches()
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+
+    def load_leaderboard(self):
+        """Return the player rows sorted by ELO, highest first."""
+        return sorted(self.load_players(), key=lambda row: row[1], reverse=True)
+
+    def append_history(self, rows):
+        """Append per-player history rows; rows already stored (same match id and player) are skipped."""
+        raise NotImplementedError
+
+    def load_player_history(self, player_name):
+        """Return one player's history rows, oldest first."""
+        raise NotImplementedError
+
+
+class SheetsStorage(StorageBackend):
+    """Google Sheets engine: ELO_Data, Match History and Player History worksheets."""
+
+    def __init__(self, open_worksheet, player_tab, match_tab, history_tab):
+        # Worksheets are opened on first use, so building this does no network work
+        self.open_worksheet = open_worksheet
+        self.player_tab = player_tab
+        self.match_tab = match_tab
+        self.history_tab = history_tab
+
+        # What we last read from or wrote to ELO_Data, by position (row 2 onwards),
+        # plus player name -> sheet row. Kept in step with every write so updates
+        # can find their rows and send only what changed without re-downloading.
+        self.row_lock = threading.Lock()
+        self.sheet_rows = None
+        self.row_index = None
+        self.row_count = 0  # Data rows below the header
+
+        # Match ids in Match History (column E), read the first time an id has to be checked
+        self.match_lock = threading.Lock()
+        self.match_ids = None
+
+        # Player History is read once, then kept per player in memory and extended
+        # by our own appends, so each timeline is served without another read
+        self.history_lock = threading.Lock()
+        self.history_index = None
+
+    def _remember_rows(self, rows):
+        """Record the full contents of the player rows (row 2 onwards)."""
+        self.sheet_rows = [list(row) for row in rows]
+        self._index_names([row[0] for row in rows])
+
+    def _index_names(self, names):
+        """Rebuild the row index from the names in sheet order (row 2 onwards)."""
+        self.row_index = {name: row for row, name in enumerate(names, start=2) if name}
+        self.row_count = len(names)
+
+    def find_row(self, player_name):
+        """Return the sheet row holding a player, reading the name column only if it isn't indexed."""
+        with self.row_lock:
+            if self.row_index is None or player_name not in self.row_index:
+                self.sheet_rows = None  # The sheet changed under us; values are unknown too
+                self._index_names(self.player_sheet.col_values(1)[1:])
+            return self.row_index[player_name]
+
+    @property
+    def player_sheet(self):
+        return self.open_worksheet(self.player_tab)
+
+    @property
+    def match_sheet(self):
+        return self.open_worksheet(self.match_tab)
+
+    @property
+    def history_sheet(self):
+        return self.open_worksheet(self.history_tab)
+
+    def load_players(self):
+        records = self.player_sheet.get_all_records(
+            expected_headers=["Player Name", "Rating", "Matches", "Streak"]
+        )
+        rows = [
+            [record["Player Name"], record["Rating"], record["Matches"], record["Streak"]]
+            for record in records
+        ]
+        with self.row_lock:
+            self._remember_rows(rows)
+        return rows
+
+    def _write_rows(self, numbered_rows):
+        """Write {sheet row: values} in one batch_update, merging consecutive rows into one range."""
+        data_to_update = []
+        for row_number in sorted(numbered_rows):
+            values = numbered_rows[row_number]
+            last = data_to_update[-1] if data_to_update else None
+            if last and last["end"] == row_number - 1:
+                last["values"].append(values)
+                last["end"] = row_number
+            else:
+                data_to_update.append({"start": row_number, "end": row_number, "values": [values]})
+        if data_to_update:
+            self.player_sheet.batch_update([
+                {"range": f"A{block['start']}:D{block['end']}", "values": block["values"]}
+                for block in data_to_update
+            ])
+
+    def save_players(self, rows):
+        if not rows:
+            return
+        rows = [list(row) for row in rows]
+        with self.row_lock:
+            known = self.sheet_rows
+        if known is None:
+            self.player_sheet.update(range_name=f"A2:D{len(rows) + 1}", values=rows)
+        else:
+            # Only send rows whose contents differ from what the sheet already holds
+            self._write_rows({
+                i: row for i, row in enumerate(rows, start=2)
+                if i - 2 >= len(known) or known[i - 2] != row
+            })
+        with self.row_lock:
+            if known is not None and len(known) > len(rows):
+                rows = rows + known[len(rows):]  # Rows past the rewritten range are untouched
+            if known is not None or self.row_index is None:
+                self._remember_rows(rows)
+            else:
+                # Names are known past the rewritten range but their values aren't
+                last_row = len(rows) + 1
+                kept = {name: row for name, row in self.row_index.items() if row > last_row}
+                self._index_names([row[0] for row in rows])
+                self.row_index.update(kept)
+                self.row_count = max(self.row_count, len(rows), *(row - 1 for row in kept.values()))
+
+    def update_players(self, rows):
+        numbered_rows = {self.find_row(row[0]): list(row) for row in rows}
+        self._write_rows(numbered_rows)
+        with self.row_lock:
+            if self.sheet_rows is not None:
+                for row_number, row in numbered_rows.items():
+                    self.sheet_rows[row_number - 2] = row
+
+    def add_players(self, rows):
+        if not rows:
+            return
+        self.player_sheet.append_rows(rows)
+        with self.row_lock:
+            if self.row_index is not None:
+                for row_number, row in enumerate(rows, start=self.row_count + 2):
+                    self.row_index[row[0]] = row_number
+                self.row_count += len(rows)
+            if self.sheet_rows is not None:
+                self.sheet_rows.extend(list(row) for row in rows)
+
+    def set_rating(self, player_name, elo):
+        row_number = self.find_row(player_name)
+        self.player_sheet.update_cell(row_number, 2, elo)
+        with self.row_lock:
+            if self.sheet_rows is not None:
+                self.sheet_rows[row_number - 2][1] = elo
+
+    def _new_matches(self, rows):
+        """Drop rows whose match id is already in Match History (or earlier in rows)."""
+        if not any(len(row) > 4 and row[4] for row in rows):
+            return rows
+        with self.match_lock:
+            if self.match_ids is None:
+                column = self.match_sheet.col_values(5)
+                if not column or column[0] != "Match ID":
+                    self.match_sheet.update_cell(1, 5, "Match ID")
+                self.match_ids = set(column[1:])
+            new_rows = []
+            for row in rows:
+                match_id = row[4] if len(row) > 4 else ""
+                if match_id and match_id in self.match_ids:
+                    continue
+                if match_id:
+                    self.match_ids.add(match_id)
+                new_rows.append(row)
+            return new_rows
+
+    def _forget_matches(self, rows):
+        # The append failed, so these ids aren't in the sheet after all
+        with self.match_lock:
+            if self.match_ids is not None:
+                self.match_ids.difference_update(row[4] for row in rows if len(row) > 4)
+
+    def append_match(self, row):
+        self.append_matches([row])
+
+    def append_matches(self, rows):
+        rows = self._new_matches(rows)
+        if not rows:
+            return
+        try:
+            if len(rows) == 1:
+                self.match_sheet.append_row(rows[0])
+            else:
+                self.match_sheet.append_rows(rows)
+        except Exception:
+            self._forget_matches(rows)
+            raise
+
+    def load_matches(self):
+        return self.match_sheet.get_all_values()[1:]  # Skip the header row
+
+    def _history(self):
+        with self.history_lock:
+            if self.history_index is None:
+                self.history_index = HistoryIndex(self.history_sheet.get_all_values()[1:])
+            return self.history_index
+
+    def append_history(self, rows):
+        if not rows:
+            return
+        index = self._history()
+        with self.history_lock:
+            rows = index.new_rows(rows)
+        if rows:
+            self.history_sheet.append_rows(rows)
+            with self.history_lock:
+                index.add(rows)
+
+    def load_player_history(self, player_name):
+        index = self._history()
+        with self.history_lock:
+            return index.rows(player_name)
+
+
+class SQLiteStorage(StorageBackend):
+    """Local SQLite engine, so reads and writes never leave the machine."""
+
+    def __init__(self, path):
+        # Streamlit reruns on different threads, so share one connection behind a lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS players ("
+                " name TEXT PRIMARY KEY, elo INTEGER NOT NULL, matches INTEGER NOT NULL,"
+                " streak INTEGER NOT NULL, position INTEGER NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS players_by_elo ON players (elo DESC)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS matches ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, team1 TEXT, team2 TEXT,"
+                " score TEXT, synced INTEGER NOT NULL DEFAULT 0, match_id TEXT)"
+            )
+            # Databases made before match ids existed don't have the column yet
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(matches)")]
+            if "match_id" not in columns:
+                self.conn.execute("ALTER TABLE matches ADD COLUMN match_id TEXT")
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS matches_by_id ON matches (match_id)")
+            # One row per player per match; the player index keeps each timeline a range scan
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                " match_id TEXT NOT NULL, date TEXT, player TEXT NOT NULL, pre INTEGER NOT NULL,"
+                " post INTEGER NOT NULL, delta INTEGER NOT NULL, streak INTEGER NOT NULL,"
+                " synced INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (match_id, player))"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS history_by_player ON history (player)")
+
+    def load_players(self):
+        with self.lock:
+            return [
+                list(row) for row in self.conn.execute(
+                    "SELECT name, elo, matches, streak FROM players ORDER BY position"
+                )
+            ]
+
+    def save_players(self, rows):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO players (name, elo, matches, streak, position) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET elo = excluded.elo, matches = excluded.matches,"
+                " streak = excluded.streak, position = excluded.position",
+                [(*row, position) for position, row in enumerate(rows)],
+            )
+
+    def add_players(self, rows):
+        with self.lock, self.conn:
+            (start,) = self.conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM players"
+            ).fetchone()
+            self.conn.executemany(
+                "INSERT INTO players (name, elo, matches, streak, position) VALUES (?, ?, ?, ?, ?)",
+                [(*row, position) for position, row in enumerate(rows, start=start)],
+            )
+
+    def update_players(self, rows):
+        with self.lock, self.conn:
+            names = {row[0] for row in rows}
+            found = set()
+            names_list = list(names)
+            for start in range(0, len(names_list), 500):  # SQLite caps the number of parameters
+                chunk = names_list[start:start + 500]
+                found.update(name for (name,) in self.conn.execute(
+                    f"SELECT name FROM players WHERE name IN ({', '.join('?' * len(chunk))})", chunk
+                ))
+            missing = names - found
+            if missing:
+                raise KeyError(sorted(missing)[0])
+            self.conn.executemany(
+                "UPDATE players SET elo = ?, matches = ?, streak = ? WHERE name = ?",
+                [(elo, matches, streak, name) for name, elo, matches, streak in rows],
+            )
+
+    def set_rating(self, player_name, elo):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE players SET elo = ? WHERE name = ?", (elo, player_name))
+
+    def append_match(self, row):
+        self.append_matches([row])
+
+    def append_matches(self, rows):
+        # Rows without an id get NULL, which the unique index lets repeat
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO matches (date, team1, team2, score, match_id) VALUES (?, ?, ?, ?, ?)",
+                [(*row[:4], row[4] if len(row) > 4 and row[4] else None) for row in rows],
+            )
+
+    def load_matches(self):
+        with self.lock:
+            return [
+                list(row) for row in self.conn.execute(
+                    "SELECT date, team1, team2, score, COALESCE(match_id, '') FROM matches ORDER BY id"
+                )
+            ]
+
+    def iter_matches(self, chunk_size):
+        # Page by rowid so the lock isn't held while the caller works on a chunk
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT id, date, team1, team2, score, COALESCE(match_id, '') FROM matches"
+                    " WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [list(row[1:]) for row in rows]
+
+    def load_leaderboard(self):
+        with self.lock:
+            return [
+                list(row) for row in self.conn.execute(
+                    "SELECT name, elo, matches, streak FROM players ORDER BY elo DESC"
+                )
+            ]
+
+    def append_history(self, rows):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO history (match_id, date, player, pre, post, delta, streak)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def load_player_history(self, player_name):
+        with self.lock:
+            return [
+                list(row) for row in self.conn.execute(
+                    "SELECT match_id, date, player, pre, post, delta, streak FROM history"
+                    " WHERE player = ? ORDER BY rowid",
+                    (player_name,),
+                )
+            ]
+
+    def sync_to(self, target):
+        """Push the player table and any unsynced matches and history to another backend (e.g. Sheets)."""
+        with self.lock:
+            pending = self.conn.execute(
+                "SELECT id, date, team1, team2, score, COALESCE(match_id, '') FROM matches"
+                " WHERE synced = 0 ORDER BY id"
+            ).fetchall()
+            pending_history = self.conn.execute(
+                "SELECT rowid, match_id, date, player, pre, post, delta, streak FROM history"
+                " WHERE synced = 0 ORDER BY rowid"
+            ).fetchall()
+        target.save_players(self.load_players())
+        if pending:
+            target.append_matches([list(row[1:]) for row in pending])
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "UPDATE matches SET synced = 1 WHERE id <= ? AND synced = 0", (pending[-1][0],)
+                )
+        if pending_history:
+            target.append_history([list(row[1:]) for row in pending_history])
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "UPDATE history SET synced = 1 WHERE rowid <= ? AND synced = 0",
+                    (pending_history[-1][0],),
+                )
+        return len(pending)
@@ -4,7 +4,37 @@
 
 import streamlit as st
 import pandas as pd
-from elo_project import create_match, create_match_button, get_all_players, get_player_stats, get_all_names  # Import necessary functions
+from elo_history import HISTORY_HEADERS
+from elo_metrics import sheets_stats
+from elo_rating import DEFAULT_ELO, win_probability
+from elo_project import create_match, create_match_button, failed_journal_entries, get_all_players, get_player_stats, get_leaderboard_page, get_player_history, invalidate_player_cache, journal, log_match  # Import necessary functions
+
+LEADERBOARD_PAGE_SIZE = 25
+UI_CACHE_TTL = 600  # Seconds; match commits clear the cache straight away
+
+# Every widget interaction reruns this script, so player data comes from these
+# cached loaders instead of the sheet. They're shared by all sessions and cleared
+# whenever a match is committed (or the user asks for a reload).
+@st.cache_data(ttl=UI_CACHE_TTL, show_spinner=False)
+def load_player_stats():
+    """Player name -> stats dict, as plain dicts so Streamlit can cache them."""
+    return {name: dict(stats) for name, stats in get_player_stats().items()}
+
+@st.cache_data(ttl=UI_CACHE_TTL, show_spinner=False)
+def load_leaderboard_page(page, size):
+    return get_leaderboard_page(page, size)
+
+@st.cache_data(ttl=UI_CACHE_TTL, show_spinner=False)
+def load_player_history(player_name):
+    return get_player_history(player_name)
+
+def refresh_player_data(reread=False):
+    """Drop the cached player data after a commit; reread=True also drops the process-wide cache."""
+    if reread:
+        invalidate_player_cache()
+    load_player_stats.clear()
+    load_leaderboard_page.clear()
+    load_player_history.clear()
 
 # Set up Streamlit UI
 st.title("Volleyball ELO System")
@@ -12,7 +42,12 @@ st.title("Volleyball ELO System")
 # **Step 1: Enter Player Names BEFORE Clicking the Button**
 #players_input = st.text_area("Enter player names (comma-separated):")
 
-all_players = get_all_names()
+try:
+    player_stats = load_player_stats()
+except Exception as e:
+    st.error(f"Couldn't load players from Google Sheets ({e}). Please try again in a minute.")
+    st.stop()
+all_players = sorted(player_stats)
 players_input = st.multiselect("Select players for the match:", all_players)
 
 def main():
@@ -23,48 +58,88 @@ def main():
             player_list = [name.strip() for name in players_input]#.split(",")]
 
             if player_list:
-                team1, team2 = create_match_button(player_list) # Modify based on function input
+                # Ratings come from the cached stats, so this doesn't hit the sheet
+                team1, team2 = create_match_button(player_list, player_stats)
 
-                # Display the teams
-                st.subheader("Generated Teams")
-                col1, col2 = st.columns(2)
-
-                with col1:
-                    st.write("**Team 1**")
-                    st.write(f"{team1}")  # Debugging Step 4
-
-                with col2:
-                    st.write("**Team 2**")
-                    st.write(f"{team2}")  # Debugging Step 4
+                # Keep the teams across reruns so the match can be processed later
+                st.session_state.team1 = team1
+                st.session_state.team2 = team2
         else:
             st.write("⚠️ Please enter player names before clicking the button!")
 
     if "team1" in st.session_state and "team2" in st.session_state:
-            if st.button("Process Match"):
-                st.write("Which team won?")
-                col1, col2 = st.columns(2)
-                team1_won = col1.button(f"{', '.join(st.session_state.team1)}")
-                team2_won = col2.button(f"{', '.join(st.session_state.team2)}")
-                
-                score = st.text_input("Enter match score (21-XX format):")
-                if score:
+            # Display the teams
+            st.subheader("Generated Teams")
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.write("**Team 1**")
+                st.write(f"{st.session_state.team1}")
+
+            with col2:
+                st.write("**Team 2**")
+                st.write(f"{st.session_state.team2}")
+
+            if st.session_state.team1 and st.session_state.team2:
+                team1_win = win_probability(
+                    [player_stats.get(name, {}).get("elo", DEFAULT_ELO) for name in st.session_state.team1],
+                    [player_stats.get(name, {}).get("elo", DEFAULT_ELO) for name in st.session_state.team2],
+                )
+                st.caption(f"Win probability: Team 1 {team1_win:.0%}, Team 2 {1 - team1_win:.0%}")
+
+            with st.form("process_match"):
+                score = st.text_input("Enter match score as Team 1-Team 2 (21-XX format):")
+                if st.form_submit_button("Process Match"):
                     try:
                         score1, score2 = map(int, score.split('-'))
+                    except ValueError:
+                        st.error("Invalid score format. Use 21-XX.")
+                    else:
                         if score1 != 21 and score2 != 21:
                             st.error("One team must have 21 points.")
                         else:
-                            winner = st.session_state.team1 if team1_won else st.session_state.team2
-                            loser = st.session_state.team2 if team1_won else st.session_state.team1
-                            st.success(f"Winner: {', '.join(winner)} | Loser: {', '.join(loser)} | Score: {score}")
-                    except ValueError:
-                        st.error("Invalid score format. Use 21-XX.")
-                    
+                            team1, team2 = st.session_state.team1, st.session_state.team2
+                            try:
+                                log_match(",".join(team1), ",".join(team2), f"{score1}-{score2}")
+                            except Exception as e:
+                                st.error(f"Couldn't save the match to Google Sheets ({e}). Please try again in a minute.")
+                                st.stop()
+
+                            # The commit changed ratings, so the cached copies are stale now
+                            refresh_player_data()
+                            del st.session_state.team1
+                            del st.session_state.team2
+                            winner = team1 if score1 > score2 else team2
+                            loser = team2 if score1 > score2 else team1
+                            st.success(f"Winner: {', '.join(winner)} | Loser: {', '.join(loser)} | Score: {score1}-{score2}")
+
     # Button to view leaderboard
+    leaderboard_page = st.number_input("Leaderboard page", min_value=1, value=1, step=1)
     if st.button("View Leaderboard"):
-        player_stats = get_player_stats()
-        df = pd.DataFrame(player_stats).T  # Convert dictionary to DataFrame
-        df = df.sort_values(by="elo", ascending=False)  # Sort by ELO
+        # Rows come pre-ranked from the leaderboard index; only this page is built
+        rows, num_players = load_leaderboard_page(leaderboard_page, LEADERBOARD_PAGE_SIZE)
+        first_rank = (leaderboard_page - 1) * LEADERBOARD_PAGE_SIZE + 1
+        df = pd.DataFrame(rows, columns=["Player Name", "elo", "matches", "streak"])
+        df.index = range(first_rank, first_rank + len(df))
+        df.index.name = "Rank"
         st.write(df)
+        st.caption(f"{num_players} players")
+
+    # Rating over time, from the per-player history (no replay of the match log)
+    history_player = st.selectbox("Rating history for:", [""] + all_players)
+    if history_player:
+        try:
+            history = load_player_history(history_player)
+        except Exception as e:
+            st.error(f"Couldn't load the rating history ({e}). Please try again in a minute.")
+            history = []
+        if history:
+            df = pd.DataFrame(history, columns=HISTORY_HEADERS)
+            df.index = range(1, len(df) + 1)
+            df.index.name = "Match"
+            st.line_chart(df["Post"].rename("ELO"))
+        else:
+            st.write(f"No rated matches for {history_player} yet.")
 
     if st.button("Click to get free ELO!"):
         st.write("Gullible")
@@ -72,6 +147,22 @@ def main():
     # Placeholder for match log feature (to be implemented)
     st.write("Match log feature coming soon!")
 
+    # Sheets API usage, to see what is eating the 60 reads/minute quota
+    with st.sidebar.expander("Sheets API debug"):
+        st.write(f"Reads in the last minute: {sheets_stats.reads_last_minute()} / 60")
+        if journal is not None:
+            st.write(f"Matches waiting to sync: {len(journal)}")
+            failed = failed_journal_entries()
+            if failed:
+                st.warning(f"{len(failed)} match(es) couldn't be synced and were set aside in {journal.failed_path}.")
+        st.dataframe(pd.DataFrame(sheets_stats.snapshot()))
+        if st.button("Reset counters"):
+            sheets_stats.reset()
+        # For edits made directly in the sheet, which the cached data can't see
+        if st.button("Reload player data"):
+            refresh_player_data(reread=True)
+            st.rerun()
+
 
 if __name__ == "__main__":
     main()